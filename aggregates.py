@@ -0,0 +1,89 @@
+# aggregates.py
+# Column statistics shared by the EDA / preprocessing callbacks and the JSON API.
+#
+# Every function accepts either a pandas DataFrame or a ChunkedDataset.  Use
+# ``compute(handle, name, ...)`` to get a result memoized per dataset version.
+import numpy as np
+import pandas as pd
+
+from datasets import registry
+from outofcore import TOP_VALUES, ChunkedDataset
+
+HIST_BINS = 30
+
+
+def is_numeric(ds, col):
+    if isinstance(ds, ChunkedDataset):
+        return ds.is_numeric(col)
+    return pd.api.types.is_numeric_dtype(ds[col])
+
+
+def numeric_columns(ds):
+    if isinstance(ds, ChunkedDataset):
+        return ds.numeric_columns()
+    return list(ds.select_dtypes(include="number").columns)
+
+
+def object_columns(ds):
+    if isinstance(ds, ChunkedDataset):
+        return ds.object_columns()
+    return list(ds.select_dtypes(include="object").columns)
+
+
+def missing_counts(ds):
+    if isinstance(ds, ChunkedDataset):
+        return ds.missing_counts()
+    return ds.isna().sum()
+
+
+def value_counts(ds, col):
+    if isinstance(ds, ChunkedDataset):
+        # an ID-like column of a large file has millions of values: keep the top
+        return ds.value_counts(col, top=TOP_VALUES)
+    return ds[col].value_counts()
+
+
+def profile(ds, col):
+    """Summary table: ``describe()`` for numeric columns, value counts otherwise."""
+    if not is_numeric(ds, col):
+        return value_counts(ds, col).to_frame("Count").reset_index()
+    if isinstance(ds, ChunkedDataset):
+        desc = ds.describe(col)
+    else:
+        desc = ds[col].describe()
+    return desc.to_frame("Value").reset_index()
+
+
+def histogram(ds, col, nbins=HIST_BINS):
+    """``(counts, edges)`` over ``nbins`` equal-width bins between min and max."""
+    if isinstance(ds, ChunkedDataset):
+        return ds.histogram(col, nbins)
+    values = ds[col].dropna().to_numpy(dtype="float64")
+    if not len(values):
+        return np.array([], dtype="int64"), np.array([0.0, 1.0])
+    lo, hi = values.min(), values.max()
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.histogram(values, bins=nbins, range=(lo, hi))
+
+
+def correlation(ds, x, y):
+    if isinstance(ds, ChunkedDataset):
+        return ds.corr(x, y)
+    return ds[[x, y]].corr().iloc[0, 1]
+
+
+AGGREGATES = {
+    "missing_counts": missing_counts,
+    "value_counts": value_counts,
+    "profile": profile,
+    "histogram": histogram,
+    "correlation": correlation,
+}
+
+
+def compute(handle, name, *args):
+    """Run aggregate ``name`` on the version behind ``handle``, cached per version."""
+    return registry.cached(
+        handle, (name, *args), lambda: AGGREGATES[name](registry.resolve(handle), *args)
+    )
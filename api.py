@@ -0,0 +1,264 @@
+# api.py
+# Read-only JSON endpoints on the Dash Flask server.
+#
+#   GET /api/datasets
+#   GET /api/datasets/<id>
+#   GET /api/datasets/<id>/columns
+#   GET /api/datasets/<id>/columns/<col>/profile
+#   GET /api/datasets/<id>/columns/<col>/value_counts?limit=20
+#   GET /api/datasets/<id>/columns/<col>/histogram?bins=30
+#   GET /api/datasets/<id>/correlation?x=<col>&y=<col>
+#   GET /api/datasets/<id>/cube?by=<col>&measure=<col>
+#   GET /api/datasets/<id>/csv              (streamed download)
+#   GET /api/stats
+#
+# Every dataset endpoint takes an optional ``version`` (default: latest).  The
+# numbers come from aggregates.compute, i.e. the same cached computations the
+# dashboard callbacks use.  Versions are immutable, so the ETag is derived from
+# (version uid, request) alone: a matching If-None-Match gets a 304 before
+# anything is computed or serialized.  The uid is new for every version the
+# process registers, so a tag never outlives a restart.
+#
+# A session only sees the shared datasets and the ones it uploaded itself.
+import hashlib
+
+from flask import Blueprint, Response, abort, jsonify, request, stream_with_context
+
+import aggregates
+from outofcore import CHUNK_ROWS, ChunkedDataset
+from coordinator import coordinator
+from cube import get_cube
+from datasets import registry
+from recipe import plain
+from sessions import current_session
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+MAX_HIST_BINS = 500
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def json_error(err):
+    return jsonify({"error": err.description}), err.code
+
+
+def requested_version():
+    version = request.args.get("version")
+    if version is None:
+        return None
+    try:
+        return int(version)
+    except ValueError:
+        abort(400, f"version must be an integer: {version}")
+
+
+def visible(dataset_id):
+    return registry.dataset_owner(dataset_id) in (None, current_session())
+
+
+def resolve(dataset_id):
+    """Handle of the requested version; nothing is loaded (a spilled version stays on disk)."""
+    version = requested_version()
+    try:
+        # other sessions' uploads look exactly like unknown ids
+        if not visible(dataset_id):
+            raise KeyError(dataset_id)
+        return registry.handle(dataset_id, version)
+    except KeyError:
+        abort(404, f"Unknown dataset or version: {dataset_id}")
+
+
+def load(handle):
+    try:
+        return registry.resolve(handle)
+    except KeyError:
+        abort(404, f"Unknown dataset or version: {handle['dataset']}")
+
+
+def require_column(data, col, numeric=False):
+    if col not in data.columns:
+        abort(404, f"Unknown column: {col}")
+    if numeric and not aggregates.is_numeric(data, col):
+        abort(400, f"Column is not numeric: {col}")
+
+
+def cached_response(handle, build):
+    """JSON of ``build()``, or a 304 for a matching ETag; ``build`` loads the data itself."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    tag = f"{registry.uid(handle)}:{request.path}?{query}"
+    etag = hashlib.sha1(tag.encode("utf-8")).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = jsonify(plain({"dataset": handle["dataset"], "version": handle["version"], **build()}))
+    resp.set_etag(etag)
+    if requested_version() is not None and registry.owner(handle) is not None:
+        # a pinned version of an upload can never change, and its random dataset id
+        # is not handed out again
+        resp.cache_control.private = True
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+    else:
+        # "latest" may move to a new version, and the shared datasets keep their ids
+        # across restarts: clients must revalidate
+        resp.cache_control.no_cache = True
+    return resp
+
+
+# -------------------------------------------------------------------
+# Endpoints
+# -------------------------------------------------------------------
+@api.get("/stats")
+def server_stats():
+    memory = registry.memory_report()
+    # session ids are cookie values: report the usage without them
+    memory["sessions"] = sorted(memory["sessions"].values(), key=lambda s: -s["memory_bytes"])
+    return jsonify({"callbacks": dict(coordinator.stats), "memory": memory})
+
+
+@api.get("/datasets")
+def list_datasets():
+    return jsonify([d for d in registry.datasets() if visible(d["id"])])
+
+
+@api.get("/datasets/<dataset_id>")
+def dataset_info(dataset_id):
+    handle = resolve(dataset_id)
+
+    def build():
+        data = load(handle)
+        return {"rows": data.shape[0], "columns": [str(c) for c in data.columns]}
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/columns")
+def dataset_columns(dataset_id):
+    handle = resolve(dataset_id)
+
+    def build():
+        data = load(handle)
+        missing = aggregates.compute(handle, "missing_counts")
+        return {
+            "columns": [
+                {
+                    "name": str(col),
+                    "dtype": str(dtype),
+                    "numeric": aggregates.is_numeric(data, col),
+                    "missing": missing[col],
+                }
+                for col, dtype in data.dtypes.items()
+            ]
+        }
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/columns/<col>/profile")
+def column_profile(dataset_id, col):
+    handle = resolve(dataset_id)
+
+    def build():
+        data = load(handle)
+        require_column(data, col)
+        return {
+            "column": col,
+            "numeric": aggregates.is_numeric(data, col),
+            "summary": aggregates.compute(handle, "profile", col).to_dict("records"),
+        }
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/columns/<col>/value_counts")
+def column_value_counts(dataset_id, col):
+    handle = resolve(dataset_id)
+    limit = request.args.get("limit", type=int)
+
+    def build():
+        require_column(load(handle), col)
+        vc = aggregates.compute(handle, "value_counts", col)
+        shown = vc.head(limit) if limit else vc
+        return {
+            "column": col,
+            # chunked data: the top values and an "Other" row; None past DISTINCT_LIMIT
+            "distinct": vc.attrs.get("distinct", len(vc)),
+            "counts": [{"value": v, "count": n} for v, n in shown.items()],
+        }
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/columns/<col>/histogram")
+def column_histogram(dataset_id, col):
+    handle = resolve(dataset_id)
+    bins = request.args.get("bins", default=aggregates.HIST_BINS, type=int)
+    if not 1 <= bins <= MAX_HIST_BINS:
+        abort(400, f"bins must be between 1 and {MAX_HIST_BINS}")
+
+    def build():
+        require_column(load(handle), col, numeric=True)
+        counts, edges = aggregates.compute(handle, "histogram", col, bins)
+        return {"column": col, "edges": edges, "counts": counts}
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/correlation")
+def correlation(dataset_id):
+    handle = resolve(dataset_id)
+    x, y = request.args.get("x"), request.args.get("y")
+    if not x or not y:
+        abort(400, "Both x and y query parameters are required")
+
+    def build():
+        data = load(handle)
+        require_column(data, x, numeric=True)
+        require_column(data, y, numeric=True)
+        return {"x": x, "y": y, "correlation": aggregates.compute(handle, "correlation", x, y)}
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/cube")
+def grouped_summary(dataset_id):
+    handle = resolve(dataset_id)
+    by, measure = request.args.get("by"), request.args.get("measure")
+    if not by or not measure:
+        abort(400, "Both by and measure query parameters are required")
+
+    def build():
+        cube = get_cube(handle)
+        if not cube.covers(by, measure):
+            abort(400, f"Cube dimensions: {cube.dimensions}; measures: {cube.measures}")
+        summary = cube.summary(by, measure)
+        return {"by": by, "measure": measure, "groups": summary.reset_index(names=by).to_dict("records")}
+
+    return cached_response(handle, build)
+
+
+@api.get("/datasets/<dataset_id>/csv")
+def download_csv(dataset_id):
+    data = load(resolve(dataset_id))
+
+    def chunks():
+        if isinstance(data, ChunkedDataset):
+            yield from data.iter_chunks()
+        else:
+            for start in range(0, len(data), CHUNK_ROWS):
+                yield data.iloc[start:start + CHUNK_ROWS]
+
+    def generate():
+        # one chunk of CSV text at a time: memory stays bounded by the chunk size
+        header = True
+        for chunk in chunks():
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="processed_dataset.csv"'},
+    )
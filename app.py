@@ -1,17 +1,38 @@
 # app.py
 import base64
-import io
+import math
+import uuid
 
 import pandas as pd
-from dash import Dash, html, dcc, dash_table, Input, Output, State, callback, no_update
+from dash import Dash, html, dcc, dash_table, Input, Output, Patch, State, callback, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+from flask import request
 import plotly.express as px
+import plotly.graph_objects as go
 from sklearn.model_selection import train_test_split
 
 from pages.home import layout as home_layout
 from pages.univariate import layout as univariate_layout
 from pages.bivariate import layout as bivariate_layout
 from pages.preprocessing import layout as preprocessing_layout
+from pages.timeseries import layout as timeseries_layout
+from outofcore import ChunkedDataset, OOC_THRESHOLD_BYTES
+import aggregates
+import dates
+import figures
+import ingest
+import preprocess
+import recipe
+import rollups
+import sampling
+import sessions
+from api import api
+from coordinator import checkpoint, coordinated
+from cube import CUBE_AGGREGATES, get_cube
+from datasets import claim_server, registry
+from preprocess import SCALING_METHODS
+from uploads import ingest_upload, uploads
 
 # -------------------------------------------------------------------
 # Paths to your default data (change file names if needed)
@@ -19,27 +40,36 @@ from pages.preprocessing import layout as preprocessing_layout
 RAW_DATA_PATH = "data/raw_data.csv"              # raw csv
 EDA_DATA_PATH = "data/preprocessed_data.csv"     # cleaned csv
 
+def read_dataset(path):
+    # files too big for memory stay on disk as chunked columnar parts
+    data, _ = ingest.read_csv(path, chunked=ingest.csv_size(path, OOC_THRESHOLD_BYTES) > OOC_THRESHOLD_BYTES)
+    return data
+
 def load_default_data():
-    raw_df = pd.read_csv(RAW_DATA_PATH)
-    eda_df = pd.read_csv(EDA_DATA_PATH)
+    raw_df = read_dataset(RAW_DATA_PATH)
+    eda_df = read_dataset(EDA_DATA_PATH)
     return raw_df, eda_df
 
 raw_default, eda_default = load_default_data()
 
-def df_to_store(df: pd.DataFrame) -> dict:
-    return df.to_json(date_format="iso", orient="split")
+def df_to_store(df, parent=None, name=None, step=None) -> dict:
+    # the data stays on the server; the browser store only keeps a version handle
+    # and the version is charged to the memory budget of the current session
+    return registry.add(df, parent=parent, name=name, step=step, owner=sessions.current_session())
 
-def store_to_df(data):
-    if data is None:
+def store_to_dataset(data):
+    if not isinstance(data, dict):
+        # no data yet
         return pd.DataFrame()
+    try:
+        return registry.resolve(data)
+    except KeyError:
+        # expired with its idle session, or a handle from before a server restart:
+        # check_datasets() swaps the default data back in and tells the user
+        raise PreventUpdate
 
-    if isinstance(data, bytes):
-        data = data.decode("utf-8")
-
-    if isinstance(data, dict):
-        return pd.read_json(data, orient="split")
-
-    return pd.read_json(io.StringIO(data), orient="split")
+raw_default_handle = registry.add(raw_default, dataset_id="default-raw", name=RAW_DATA_PATH)
+eda_default_handle = registry.add(eda_default, dataset_id="default-eda", name=EDA_DATA_PATH)
 
 # -------------------------------------------------------------------
 # App + basic layout
@@ -49,6 +79,22 @@ app = Dash(
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     suppress_callback_exceptions=True,
 )
+# read-only JSON endpoints over the same cached aggregates (see api.py)
+app.server.register_blueprint(api)
+# streamed uploads of files too big to send through dcc.Upload (see uploads.py)
+app.server.register_blueprint(uploads)
+# session cookie: who owns which dataset version (see datasets.py)
+sessions.init_app(app.server)
+
+@app.server.before_request
+def single_process():
+    # dataset versions live in this process: a second worker could not resolve them
+    if not claim_server(request.environ.get("SERVER_PORT")):
+        msg = "This dashboard runs as a single process with threads; another process already serves this port."
+        return msg, 503
+
+# WSGI entry point, e.g. gunicorn -w 1 --threads 8 app:server
+server = app.server
 
 # Top navigation bar
 navbar = dbc.NavbarSimple(
@@ -60,20 +106,34 @@ navbar = dbc.NavbarSimple(
         dbc.NavItem(dcc.Link("Home", href="/", className="nav-link")),
         dbc.NavItem(dcc.Link("Univariate Analysis", href="/univariate", className="nav-link")),
         dbc.NavItem(dcc.Link("Bivariate Analysis", href="/bivariate", className="nav-link")),
+        dbc.NavItem(dcc.Link("Time Series", href="/timeseries", className="nav-link")),
         dbc.NavItem(dcc.Link("Preprocessing", href="/preprocessing", className="nav-link")),
     ],
 )
 
-app.layout = html.Div(
-    [
-        dcc.Location(id="url"),
-        navbar,
-        # hidden stores to share data across pages
-        dcc.Store(id="raw-data-store", data=df_to_store(raw_default)),
-        dcc.Store(id="eda-data-store", data=df_to_store(eda_default)),
-        html.Div(id="page-content"),
-    ]
-)
+def serve_layout():
+    # a function, so that every page load gets its own tab id
+    return html.Div(
+        [
+            dcc.Location(id="url"),
+            # supersedes only this tab's own requests (see coordinator.py)
+            dcc.Store(id="tab-id", data=uuid.uuid4().hex),
+            navbar,
+            dbc.Alert(id="dataset-alert", color="warning", is_open=False, dismissable=True, className="m-2"),
+            # looks for expired datasets while the page sits idle (see check_datasets)
+            dcc.Interval(id="dataset-check", interval=60_000),
+            # hidden stores to share data across pages
+            dcc.Store(id="raw-data-store", data=raw_default_handle),
+            dcc.Store(id="eda-data-store", data=eda_default_handle),
+            # fitted preprocessing steps applied to raw-data-store (see recipe.py)
+            dcc.Store(id="recipe-store", data=[]),
+            # what the univariate / bivariate views run on: eda-data-store or its sample
+            dcc.Store(id="eda-view-store", data=eda_default_handle),
+            html.Div(id="page-content"),
+        ]
+    )
+
+app.layout = serve_layout
 
 # -------------------------------------------------------------------
 # Routing
@@ -84,11 +144,35 @@ def display_page(pathname):
         return univariate_layout()
     elif pathname == "/bivariate":
         return bivariate_layout()
+    elif pathname == "/timeseries":
+        return timeseries_layout()
     elif pathname == "/preprocessing":
         return preprocessing_layout()
     # default
     return home_layout()
 
+# -------------------------------------------------------------------
+# Expired datasets
+# -------------------------------------------------------------------
+@callback(
+    Output("dataset-alert", "children"),
+    Output("dataset-alert", "is_open"),
+    Output("raw-data-store", "data", allow_duplicate=True),
+    Output("eda-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
+    Input("url", "pathname"),
+    Input("dataset-check", "n_intervals"),
+    State("raw-data-store", "data"),
+    State("eda-data-store", "data"),
+    prevent_initial_call=True,
+)
+def check_datasets(pathname, n_intervals, raw, eda):
+    # the views raise PreventUpdate on a dead handle; here the stores are reset
+    if all(registry.alive(handle) for handle in (raw, eda)):
+        return no_update, no_update, no_update, no_update, no_update
+    msg = "Your dataset expired after a period of inactivity. Please re-upload it on the Home page."
+    return msg, True, raw_default_handle, eda_default_handle, []
+
 # -------------------------------------------------------------------
 # File upload (Home page) – shared for all pages
 # -------------------------------------------------------------------
@@ -96,25 +180,113 @@ def display_page(pathname):
     Output("upload-status", "children"),
     Output("raw-data-store", "data", allow_duplicate=True),
     Output("eda-data-store", "data"),
+    Output("recipe-store", "data"),
     Input("upload-data", "contents"),
     State("upload-data", "filename"),
     prevent_initial_call=True,
 )
 def handle_upload(contents, filename):
     if contents is None:
-        return no_update, no_update, no_update
+        return no_update, no_update, no_update, no_update
 
+    # the whole file arrives in memory here; large files go through the streamed upload
     content_type, content_string = contents.split(",")
     decoded = base64.b64decode(content_string)
     try:
-        df = pd.read_csv(io.StringIO(decoded.decode("utf-8")))
-    except Exception:
-        return "Error: could not read the uploaded file as CSV.", no_update, no_update
+        handle, msg = ingest_upload(decoded, filename)
+    except ValueError as exc:
+        return f"Error: {exc}.", no_update, no_update, no_update
+
+    # For uploaded data, use same DF as both raw and EDA baseline; start a new recipe
+    return msg, handle, handle, []
+
+# the browser posts the file itself to /upload (see uploads.py), streamed from disk
+app.clientside_callback(
+    """
+    async function(n_clicks) {
+        const input = document.getElementById("upload-large-file");
+        if (!input || !input.files.length) {
+            return {error: "Choose a file first."};
+        }
+        const file = input.files[0];
+        const response = await fetch("/upload?name=" + encodeURIComponent(file.name), {
+            method: "POST",
+            headers: {"Content-Type": "application/octet-stream"},
+            body: file,
+        });
+        return await response.json();
+    }
+    """,
+    Output("streamed-upload", "data"),
+    Input("btn-upload-large", "n_clicks"),
+    prevent_initial_call=True,
+)
 
-    msg = f"Uploaded file: {filename} | Shape: {df.shape[0]} rows, {df.shape[1]} columns"
+@callback(
+    Output("upload-status", "children", allow_duplicate=True),
+    Output("raw-data-store", "data", allow_duplicate=True),
+    Output("eda-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
+    Input("streamed-upload", "data"),
+    prevent_initial_call=True,
+)
+def handle_streamed_upload(result):
+    if not result or "handle" not in result:
+        return (result or {}).get("error", no_update), no_update, no_update, no_update
+    return result["message"], result["handle"], result["handle"], []
 
-    # For uploaded data, use same DF as both raw and EDA baseline
-    return msg, df_to_store(df), df_to_store(df)
+@callback(
+    Output("session-memory", "children"),
+    Input("raw-data-store", "data"),
+    Input("eda-data-store", "data"),
+)
+def show_session_memory(raw, eda):
+    report = registry.memory_report()
+    usage = report["sessions"].get(sessions.current_session(), {})
+    mb = 1024 ** 2
+    msg = (
+        f"Session memory: {usage.get('memory_bytes', 0) / mb:.1f} MB of "
+        f"{report['session_budget'] / mb:.0f} MB in memory"
+    )
+    if usage.get("on_disk"):
+        msg += f" | {usage['on_disk']} older version(s) spilled to disk"
+    return msg
+
+# ===================================================================
+# SAMPLING (shared by the univariate and bivariate views)
+# ===================================================================
+@callback(
+    Output("sampling-strata", "options"),
+    Output("sampling-strata", "value"),
+    Input("eda-data-store", "data"),
+)
+def populate_strata(data):
+    store_to_dataset(data)  # stops here if the version has expired
+    # low-cardinality categoricals, the same ones the cube groups by
+    dims = get_cube(data).dimensions if isinstance(data, dict) else []
+    value = "Return_Status" if "Return_Status" in dims else (dims[0] if dims else None)
+    return [{"label": c, "value": c} for c in dims], value
+
+@callback(
+    Output("eda-view-store", "data"),
+    Output("sampling-badge", "children"),
+    Output("sampling-badge", "color"),
+    Output("sampling-strata", "disabled"),
+    Input("sampling-mode", "value"),
+    Input("sampling-strata", "value"),
+    Input("eda-data-store", "data"),
+)
+def update_sampling(mode, strata, data):
+    try:
+        view = sampling.sample_view(data, mode, strata)
+    except KeyError:
+        view = data
+    badge = sampling.describe(view)
+    if badge is None:
+        badge, color = f"Full data: {store_to_dataset(data).shape[0]:,} rows", "secondary"
+    else:
+        color = "warning"
+    return view, badge, color, mode != "stratified"
 
 # ===================================================================
 # UNIVARIATE ANALYSIS CALLBACKS
@@ -124,32 +296,39 @@ def handle_upload(contents, filename):
     Input("eda-data-store", "data"),
 )
 def populate_uni_vars(data):
-    df = store_to_df(data)
+    df = store_to_dataset(data)
     return [{"label": col, "value": col} for col in df.columns]
 
 @callback(
     Output("uni-summary", "children"),
     Output("uni-graph", "figure"),
+    Output("uni-view", "data"),
     Input("uni-variable", "value"),
     Input("uni-plot-type", "value"),
-    Input("eda-data-store", "data"),
+    Input("eda-view-store", "data"),
+    State("uni-template", "value"),
+    State("uni-height", "value"),
+    State("uni-view", "data"),
+    State("tab-id", "data"),
 )
-def update_univariate(var, plot_type, data):
-    df = store_to_df(data)
+@coordinated("uni-graph")
+def update_univariate(var, plot_type, data, template, height, view):
+    df = store_to_dataset(data)
     if var is None:
-        empty_fig = px.scatter()
-        empty_fig.update_layout(height=450)
-        return "Please select a variable.", empty_fig
+        return "Please select a variable.", figures.style(px.scatter(), template, height), None
 
-    series = df[var]
+    numeric = aggregates.is_numeric(df, var)
+    drawn = {"var": var, "plot_type": plot_type, "data": data, "numeric": numeric}
 
-    # summary
-    if pd.api.types.is_numeric_dtype(series):
-        desc = series.describe().to_frame("Value").reset_index()
-    else:
-        desc = series.value_counts().to_frame("Count").reset_index().rename(
-            columns={"index": "Value"}
-        )
+    # histogram <-> distribution of the same column: the bars are already in the browser
+    if numeric and view and {view["plot_type"], plot_type} == {"hist", "dist"} \
+            and view["var"] == var and view["data"] == data:
+        return no_update, distribution_patch(data, var, plot_type == "dist"), drawn
+
+    # summary (cached per dataset version, shared with the JSON API)
+    desc = aggregates.compute(data, "profile", var)
+    if data.get("sample"):
+        desc = sampling.with_intervals(desc, df, var, data["sample"], numeric)
 
     summary_table = dash_table.DataTable(
         data=desc.to_dict("records"),
@@ -158,24 +337,57 @@ def update_univariate(var, plot_type, data):
         style_cell={"textAlign": "left"},
     )
 
-    # graph
-    if plot_type == "hist":
-        fig = px.histogram(df, x=var, nbins=30)
-    elif plot_type == "box":
-        fig = px.box(df, x=var)
-    elif plot_type == "violin":
-        fig = px.violin(df, x=var, box=True)
-    elif plot_type == "count":
-            vc = df[var].value_counts().reset_index()
-            vc.columns = [var, "Count"]  # rename properly
-            fig = px.bar(vc, x=var, y="Count")
-
-    else:  # distribution (hist + box style)
-        fig = px.histogram(df, x=var, nbins=30)
+    # stop here if a newer selection has already replaced this one
+    checkpoint()
 
-    fig.update_layout(template="simple_white", height=450)
+    # graph
+    if plot_type in ("box", "violin"):
+        # raw-point plots; chunked datasets draw them from a bounded row sample
+        rows = df.sample(columns=[var]) if isinstance(df, ChunkedDataset) else df
+        if plot_type == "box":
+            fig = px.box(rows, x=var)
+        else:
+            fig = px.violin(rows, x=var, box=True)
+    elif plot_type == "count" or not numeric:
+        vc = aggregates.compute(data, "value_counts", var).reset_index()
+        vc.columns = [var, "Count"]  # rename properly
+        fig = px.bar(vc, x=var, y="Count")
+    else:  # histogram / distribution (hist + density outline)
+        fig = histogram_bar(data, var)
+        if plot_type == "dist":
+            fig.add_trace(density_line(data, var))
+
+    return summary_table, figures.style(fig, template, height), drawn
+
+def histogram_bar(data, var, nbins=aggregates.HIST_BINS):
+    # binned on the server: one bar per bin instead of one point per row
+    counts, edges = aggregates.compute(data, "histogram", var, nbins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    # go.Bar rather than px.bar: an all-missing column gives empty arrays
+    fig = go.Figure(go.Bar(x=centers[: len(counts)], y=counts, name="count"))
+    fig.update_layout(bargap=0, showlegend=False, xaxis_title=var, yaxis_title="count")
+    return fig
+
+def density_line(data, var):
+    return figures.density_trace(*aggregates.compute(data, "histogram", var, aggregates.HIST_BINS))
+
+def distribution_patch(data, var, show):
+    # add or remove the density outline; the histogram trace stays as it is
+    patch = Patch()
+    if show:
+        patch["data"].append(density_line(data, var))
+    else:
+        del patch["data"][1]
+    return patch
 
-    return summary_table, fig
+@callback(
+    Output("uni-graph", "figure", allow_duplicate=True),
+    Input("uni-template", "value"),
+    Input("uni-height", "value"),
+    prevent_initial_call=True,
+)
+def restyle_univariate(template, height):
+    return figures.style_patch(template, height)
 
 # ===================================================================
 # BIVARIATE ANALYSIS CALLBACKS
@@ -186,25 +398,41 @@ def update_univariate(var, plot_type, data):
     Input("eda-data-store", "data"),
 )
 def populate_bi_vars(data):
-    df = store_to_df(data)
+    df = store_to_dataset(data)
     opts = [{"label": c, "value": c} for c in df.columns]
     return opts, opts
 
 @callback(
     Output("bi-graph", "figure"),
     Output("bi-summary", "children"),
+    Output("bi-view", "data"),
     Input("bi-x", "value"),
     Input("bi-y", "value"),
     Input("bi-plot-type", "value"),
-    Input("eda-data-store", "data"),
+    Input("eda-view-store", "data"),
+    State("bi-agg", "value"),
+    State("bi-template", "value"),
+    State("bi-height", "value"),
+    State("tab-id", "data"),
 )
-def update_bivariate(x, y, plot_type, data):
-    df = store_to_df(data)
+@coordinated("bi-graph")
+def update_bivariate(x, y, plot_type, data, agg, template, height):
+    df = store_to_dataset(data)
     if x is None or y is None:
-        empty_fig = px.scatter()
-        empty_fig.update_layout(height=450)
-        return empty_fig, "Please select both X and Y variables."
+        return figures.style(px.scatter(), template, height), "Please select both X and Y variables.", None
+
+    # bar plots over a categorical X are answered from the cube: one bar per category
+    if plot_type == "bar":
+        cube = get_cube(data)
+        if cube.covers(x, y):
+            drawn = {"x": x, "y": y, "data": data, "cube": True}
+            fig, summary = cube_bar(cube, x, y, agg or "sum", data)
+            return figures.style(fig, template, height), summary, drawn
 
+    # raw-point plots; chunked datasets draw them from a bounded row sample
+    if isinstance(df, ChunkedDataset):
+        df = df.sample(columns=list(dict.fromkeys([x, y])))
+    checkpoint()
 
     if plot_type == "scatter":
         fig = px.scatter(df, x=x, y=y)
@@ -215,17 +443,129 @@ def update_bivariate(x, y, plot_type, data):
     else:  # bar
         fig = px.bar(df, x=x, y=y)
 
-    fig.update_layout(template="simple_white", height=450)
-
     # simple correlation message for numeric pairs
     msg = ""
-    if pd.api.types.is_numeric_dtype(df[x]) and pd.api.types.is_numeric_dtype(df[y]):
-        corr = df[[x, y]].corr().iloc[0, 1]
+    if aggregates.is_numeric(df, x) and aggregates.is_numeric(df, y):
+        corr = aggregates.compute(data, "correlation", x, y)
         msg = f"Correlation between {x} and {y}: {corr:.3f}"
+        interval = sampling.correlation_interval(corr, data["sample"]) if data.get("sample") else None
+        if interval:
+            msg += f" (95% CI {interval[0]:.3f} to {interval[1]:.3f})"
     else:
         msg = "Correlation only computed for numeric X and Y."
 
-    return fig, msg
+    return figures.style(fig, template, height), msg, None
+
+def cube_summary(cube, x, y, data):
+    summary = cube.summary(x, y)
+    if data.get("sample"):
+        # counts and sums over a sample, scaled up to estimates for all rows
+        summary[["count", "sum"]] *= sampling.expansion(data["sample"])
+    return summary
+
+def cube_bar(cube, x, y, agg, data):
+    summary = cube_summary(cube, x, y, data)
+    label = f"{CUBE_AGGREGATES[agg]} of {y}"
+
+    fig = px.bar(x=summary.index, y=summary[agg], labels={"x": x, "y": label})
+
+    # grouped summary from the same cells
+    table = summary.reset_index(names=x).round(3)
+    return fig, html.Div(
+        [
+            html.P(f"Aggregates of {y} by {x} ({len(summary)} groups)."),
+            dash_table.DataTable(
+                data=table.to_dict("records"),
+                columns=[{"name": c, "id": c} for c in table.columns],
+                style_table={"maxHeight": "300px", "overflowY": "auto"},
+                style_cell={"textAlign": "left"},
+            ),
+        ]
+    )
+
+@callback(
+    Output("bi-graph", "figure", allow_duplicate=True),
+    Input("bi-agg", "value"),
+    State("bi-x", "value"),
+    State("bi-y", "value"),
+    State("bi-plot-type", "value"),
+    State("eda-view-store", "data"),
+    State("bi-view", "data"),
+    prevent_initial_call=True,
+)
+def update_bivariate_agg(agg, x, y, plot_type, data, view):
+    # the aggregate only matters for the cube bars on screen: change their heights;
+    # scatter / box / violin and raw bars are left alone instead of being redrawn
+    if plot_type != "bar" or view != {"x": x, "y": y, "data": data, "cube": True}:
+        raise PreventUpdate
+    store_to_dataset(data)  # stops here if the version has expired
+    return cube_bar_patch(get_cube(data), x, y, agg or "sum", data)
+
+def cube_bar_patch(cube, x, y, agg, data):
+    patch = Patch()
+    patch["data"][0]["y"] = cube_summary(cube, x, y, data)[agg].tolist()
+    patch["layout"]["yaxis"]["title"]["text"] = f"{CUBE_AGGREGATES[agg]} of {y}"
+    return patch
+
+@callback(
+    Output("bi-graph", "figure", allow_duplicate=True),
+    Input("bi-template", "value"),
+    Input("bi-height", "value"),
+    prevent_initial_call=True,
+)
+def restyle_bivariate(template, height):
+    return figures.style_patch(template, height)
+
+# ===================================================================
+# TIME SERIES CALLBACKS
+# ===================================================================
+@callback(
+    Output("ts-columns", "options"),
+    Output("ts-columns", "value"),
+    Input("eda-data-store", "data"),
+)
+def populate_ts_columns(data):
+    cols = rollups.date_columns(store_to_dataset(data))
+    return [{"label": c, "value": c} for c in cols], cols
+
+@callback(
+    Output("ts-summary", "children"),
+    Output("ts-graph", "figure"),
+    Input("ts-columns", "value"),
+    Input("ts-freq", "value"),
+    Input("eda-data-store", "data"),
+    State("tab-id", "data"),
+)
+@coordinated("ts-graph")
+def update_timeseries(columns, freq, data):
+    store_to_dataset(data)  # stops here if the version has expired
+    if not columns:
+        empty_fig = px.line()
+        empty_fig.update_layout(height=450)
+        return "Select at least one date column.", empty_fig
+
+    # per-day rollups are cached per dataset version; week/month are resampled from them
+    series = {col: rollups.rollup(data, col, freq) for col in columns}
+    counts = pd.DataFrame(series).fillna(0).astype("int64")
+    counts.index.name = "Period"
+
+    long = counts.reset_index().melt(id_vars="Period", var_name="Column", value_name="Rows")
+    fig = px.line(long, x="Period", y="Rows", color="Column")
+    fig.update_layout(template="simple_white", height=450)
+
+    period = rollups.FREQUENCIES[freq].lower()
+    summary = html.Ul(
+        [
+            html.Li(
+                f"{col}: {s.sum()} rows, peak {s.max()} per {period} "
+                f"on {s.idxmax():%Y-%m-%d}"
+            )
+            for col, s in series.items()
+            if not s.empty
+        ]
+    )
+
+    return summary, fig
 
 # ===================================================================
 # PREPROCESSING PIPELINE CALLBACKS
@@ -247,10 +587,12 @@ def update_bivariate(x, y, plot_type, data):
     Input("raw-data-store", "data"),
 )
 def refresh_preprocess_views(data):
-    df = store_to_df(data)
+    df = store_to_dataset(data)
 
     # summary text
-    mv_total = df.isna().sum().sum()
+    # cached per version: a chunked dataset is scanned once, not on every refresh
+    mv = aggregates.compute(data, "missing_counts") if isinstance(data, dict) else aggregates.missing_counts(df)
+    mv_total = mv.sum()
     summary = html.Div(
         [
             html.P(f"Rows: {df.shape[0]}, Columns: {df.shape[1]}"),
@@ -259,7 +601,6 @@ def refresh_preprocess_views(data):
     )
 
     # missing values table
-    mv = df.isna().sum()
     mv_df = mv[mv > 0].to_frame("Missing Count").reset_index()
     mv_df.rename(columns={"index": "Column"}, inplace=True)
 
@@ -275,14 +616,8 @@ def refresh_preprocess_views(data):
 
     # options
     all_cols = [{"label": c, "value": c} for c in df.columns]
-    num_cols = [
-        {"label": c, "value": c}
-        for c in df.select_dtypes(include="number").columns
-    ]
-    cat_cols = [
-        {"label": c, "value": c}
-        for c in df.select_dtypes(include="object").columns
-    ]
+    num_cols = [{"label": c, "value": c} for c in aggregates.numeric_columns(df)]
+    cat_cols = [{"label": c, "value": c} for c in aggregates.object_columns(df)]
 
     return (
         summary,
@@ -298,140 +633,187 @@ def refresh_preprocess_views(data):
         all_cols,          # split-target
     )
 
+def fit_step(df, name, *args):
+    # chunked datasets fit with their own scans; DataFrames use preprocess
+    if isinstance(df, ChunkedDataset):
+        return getattr(df, name)(*args)
+    return getattr(preprocess, name)(df, *args)
+
+def apply_recipe_step(df, step, data, steps):
+    # apply a fitted step as a new version of the dataset and append it to the recipe
+    if isinstance(df, ChunkedDataset):
+        df = df.apply_step(step)
+    else:
+        df = recipe.apply_step(df, step)
+    return df_to_store(df, parent=data, step=step), (steps or []) + [step]
+
 # 2) Missing values
 @callback(
     Output("raw-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
     Output("missing-message", "children"),
     Input("btn-apply-missing", "n_clicks"),
     State("missing-column", "value"),
     State("missing-method", "value"),
     State("missing-constant", "value"),
     State("raw-data-store", "data"),
+    State("recipe-store", "data"),
     prevent_initial_call=True,
 )
-def apply_missing(n_clicks, column, method, custom_value, data):
-    if n_clicks is None or column is None or method is None:
-        return no_update, "Select a column and method."
+def apply_missing(n_clicks, columns, method, custom_value, data, steps):
+    if n_clicks is None or not columns or method is None:
+        return no_update, no_update, "Select one or more columns and a method."
 
-    df = store_to_df(data)
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    names = ", ".join(columns)
+    df = store_to_dataset(data)
 
     if method == "drop":
-        df = df[df[column].notna()]
-        msg = f"Dropped rows where {column} was missing."
-    elif method == "mean":
-        df[column].fillna(df[column].mean(), inplace=True)
-        msg = f"Filled missing {column} with mean."
-    elif method == "median":
-        df[column].fillna(df[column].median(), inplace=True)
-        msg = f"Filled missing {column} with median."
-    elif method == "mode":
-        df[column].fillna(df[column].mode()[0], inplace=True)
-        msg = f"Filled missing {column} with mode."
-    else:  # constant
-        df[column].fillna(custom_value, inplace=True)
-        msg = f"Filled missing {column} with constant value: {custom_value}"
-
-    return df_to_store(df), msg
+        step = recipe.make_step("drop_missing", columns=columns)
+        msg = f"Dropped rows where {names} was missing."
+        return *apply_recipe_step(df, step, data, steps), msg
+
+    if method == "constant" and (custom_value is None or not str(custom_value).strip()):
+        return no_update, no_update, "Enter a constant value to fill with."
+
+    if method in ("mean", "median"):
+        bad = [c for c in columns if not aggregates.is_numeric(df, c)]
+        if bad:
+            msg = f"{method.title()} needs numeric columns: {', '.join(bad)}."
+            return no_update, no_update, msg
+
+    # statistics for every selected column come from one pass over the block
+    try:
+        fill_values = fit_step(df, "fit_fill_values", columns, method, custom_value)
+    except ValueError:
+        msg = f"Constant value {custom_value!r} is not a number, but some selected columns are numeric."
+        return no_update, no_update, msg
+    step = recipe.make_step("fill_missing", method=method, values=fill_values)
+
+    if method == "constant":
+        msg = f"Filled missing {names} with constant value: {custom_value}"
+    else:
+        msg = f"Filled missing {names} with {method}."
+
+    return *apply_recipe_step(df, step, data, steps), msg
 
 # 3) Data type conversion
 @callback(
     Output("raw-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
     Output("dtype-message", "children"),
     Input("btn-apply-dtype", "n_clicks"),
     State("dtype-column", "value"),
     State("dtype-newtype", "value"),
     State("raw-data-store", "data"),
+    State("recipe-store", "data"),
     prevent_initial_call=True,
 )
-def apply_dtype(n_clicks, column, newtype, data):
+def apply_dtype(n_clicks, column, newtype, data, steps):
     if n_clicks is None or column is None or newtype is None:
-        return no_update, "Select a column and new data type."
+        return no_update, no_update, "Select a column and new data type."
 
-    df = store_to_df(data)
+    df = store_to_dataset(data)
+    params = {}
+    if newtype == "datetime":
+        # fitted once, so every chunk (and a replayed recipe) parses the same way
+        params["date_format"] = dates.infer_date_format(df.head(dates.DATE_SAMPLE_ROWS)[column])
+    step = recipe.make_step("astype", column=column, newtype=newtype, **params)
 
     try:
-        if newtype == "int":
-            df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
-        elif newtype == "float":
-            df[column] = pd.to_numeric(df[column], errors="coerce")
-        elif newtype == "category":
-            df[column] = df[column].astype("category")
-        elif newtype == "datetime":
-            df[column] = pd.to_datetime(df[column], errors="coerce")
-        else:  # string
-            df[column] = df[column].astype(str)
+        stored, steps = apply_recipe_step(df, step, data, steps)
     except Exception:
-        return no_update, "Conversion failed, please check the column values."
+        return no_update, no_update, "Conversion failed, please check the column values."
 
-    return df_to_store(df), f"Converted {column} to {newtype}."
+    return stored, steps, f"Converted {column} to {newtype}."
 
 # 4) Discretization
 @callback(
     Output("raw-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
     Output("disc-message", "children"),
     Input("btn-apply-disc", "n_clicks"),
     State("disc-column", "value"),
     State("disc-bins", "value"),
     State("raw-data-store", "data"),
+    State("recipe-store", "data"),
     prevent_initial_call=True,
 )
-def apply_discretization(n_clicks, column, bins, data):
+def apply_discretization(n_clicks, column, bins, data, steps):
     if n_clicks is None or column is None or bins is None:
-        return no_update, "Select a numeric column and number of bins."
+        return no_update, no_update, "Select a numeric column and number of bins."
 
-    df = store_to_df(data)
+    df = store_to_dataset(data)
     new_col = f"{column}_bin"
-    df[new_col] = pd.cut(df[column], bins=bins, labels=False, include_lowest=True)
+    edges = fit_step(df, "fit_bin_edges", column, bins)
+    step = recipe.make_step("discretize", column=column, new_column=new_col, edges=edges)
 
-    return df_to_store(df), f"Created discretized column {new_col} with {bins} bins."
+    msg = f"Created discretized column {new_col} with {bins} bins."
+    return *apply_recipe_step(df, step, data, steps), msg
 
-# 5) Normalization (min-max)
+# 5) Normalization (min-max / z-score / robust)
 @callback(
     Output("raw-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
     Output("norm-message", "children"),
     Input("btn-apply-norm", "n_clicks"),
     State("norm-columns", "value"),
+    State("norm-method", "value"),
     State("raw-data-store", "data"),
+    State("recipe-store", "data"),
     prevent_initial_call=True,
 )
-def apply_normalization(n_clicks, columns, data):
+def apply_normalization(n_clicks, columns, method, data, steps):
     if n_clicks is None or not columns:
-        return no_update, "Select at least one numeric column to normalize."
+        return no_update, no_update, "Select at least one numeric column to normalize."
+
+    method = method or "minmax"
+    df = store_to_dataset(data)
+    params = fit_step(df, "fit_scaling", columns, method)
+    step = recipe.make_step("scale", method=method, params=params)
 
-    df = store_to_df(data)
-    for col in columns:
-        col_min = df[col].min()
-        col_max = df[col].max()
-        if col_max != col_min:
-            df[col] = (df[col] - col_min) / (col_max - col_min)
+    scaled = [c for c in columns if c in params]
+    skipped = [c for c in columns if c not in params]
+    parts = []
+    if scaled:
+        parts.append(f"Applied {SCALING_METHODS[method]} scaling to: {', '.join(scaled)}.")
+    if skipped:
+        parts.append(f"Left constant columns unchanged: {', '.join(skipped)}.")
+    msg = " ".join(parts)
 
-    return df_to_store(df), f"Applied min-max normalization to: {', '.join(columns)}."
+    return *apply_recipe_step(df, step, data, steps), msg
 
 # 6) Encoding
 @callback(
     Output("raw-data-store", "data", allow_duplicate=True),
+    Output("recipe-store", "data", allow_duplicate=True),
     Output("enc-message", "children"),
     Input("btn-apply-enc", "n_clicks"),
     State("enc-columns", "value"),
     State("enc-method", "value"),
     State("raw-data-store", "data"),
+    State("recipe-store", "data"),
     prevent_initial_call=True,
 )
-def apply_encoding(n_clicks, columns, method, data):
+def apply_encoding(n_clicks, columns, method, data, steps):
     if n_clicks is None or not columns or method is None:
-        return no_update, "Select categorical columns and an encoding method."
+        return no_update, no_update, "Select categorical columns and an encoding method."
 
-    df = store_to_df(data)
+    df = store_to_dataset(data)
+    # the category lists are recorded so new files get the same codes / dummy columns
+    try:
+        categories = fit_step(df, "fit_label_encoding", columns)
+    except ValueError as exc:
+        return no_update, no_update, f"Cannot encode: {exc}."
 
     if method == "onehot":
-        df = pd.get_dummies(df, columns=columns, drop_first=True)
+        step = recipe.make_step("onehot", categories=categories, drop_first=True)
         msg = f"Applied one-hot encoding to: {', '.join(columns)}."
-    else:  # label encoding (simple)
-        for col in columns:
-            df[col] = df[col].astype("category").cat.codes
+    else:  # label encoding
+        step = recipe.make_step("label_encode", categories=categories)
         msg = f"Applied label encoding to: {', '.join(columns)}."
 
-    return df_to_store(df), msg
+    return *apply_recipe_step(df, step, data, steps), msg
 
 # 7) Train-test split
 @callback(
@@ -446,18 +828,28 @@ def apply_split(n_clicks, target, train_size, data):
     if n_clicks is None or target is None:
         return "Select a target column."
 
-    df = store_to_df(data)
-    X = df.drop(columns=[target])
-    y = df[target]
+    df = store_to_dataset(data)
+    if isinstance(df, ChunkedDataset):
+        # same sizes train_test_split would produce, without loading the rows
+        n_rows, n_cols = df.shape
+        n_train = math.floor(train_size * n_rows)
+        n_test = n_rows - n_train
+        X_train, X_test = (n_train, n_cols - 1), (n_test, n_cols - 1)
+        y_train, y_test = (n_train,), (n_test,)
+    else:
+        X = df.drop(columns=[target])
+        y = df[target]
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, train_size=train_size, random_state=42
-    )
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, train_size=train_size, random_state=42
+        )
+        X_train, X_test = X_train.shape, X_test.shape
+        y_train, y_test = y_train.shape, y_test.shape
 
     msg = (
         f"Train-test split done with train_size={train_size}.\n"
-        f"X_train: {X_train.shape}, X_test: {X_test.shape}, "
-        f"y_train: {y_train.shape}, y_test: {y_test.shape}"
+        f"X_train: {X_train}, X_test: {X_test}, "
+        f"y_train: {y_train}, y_test: {y_test}"
     )
 
     return msg
@@ -465,13 +857,38 @@ def apply_split(n_clicks, target, train_size, data):
 # 8) Download processed dataset
 @callback(
     Output("download-processed", "data"),
+    Output("download-location", "href"),
     Input("btn-download-processed", "n_clicks"),
     State("raw-data-store", "data"),
     prevent_initial_call=True,
 )
 def download_processed(n_clicks, data):
-    df = store_to_df(data)
-    return dcc.send_data_frame(df.to_csv, "processed_dataset.csv", index=False)
+    df = store_to_dataset(data)
+    if isinstance(df, ChunkedDataset):
+        # dcc.Download would base64 the whole file in memory: point the browser
+        # at the streamed CSV route instead (n_clicks makes every click a new URL)
+        href = f"/api/datasets/{data['dataset']}/csv?version={data['version']}&click={n_clicks}"
+        return no_update, href
+    return dcc.send_data_frame(df.to_csv, "processed_dataset.csv", index=False), no_update
+
+# 9) Fitted recipe: list the recorded steps and download them as JSON
+@callback(
+    Output("recipe-steps", "children"),
+    Input("recipe-store", "data"),
+)
+def show_recipe(steps):
+    if not steps:
+        return html.P("No preprocessing steps applied yet.")
+    return html.Ol([html.Li(recipe.describe_step(step)) for step in steps])
+
+@callback(
+    Output("download-recipe", "data"),
+    Input("btn-download-recipe", "n_clicks"),
+    State("recipe-store", "data"),
+    prevent_initial_call=True,
+)
+def download_recipe(n_clicks, steps):
+    return dcc.send_string(recipe.dumps(steps or []), "preprocessing_recipe.json")
 
 # -------------------------------------------------------------------
 if __name__ == "__main__":
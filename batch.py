@@ -0,0 +1,81 @@
+# batch.py
+# Headless runner: apply a downloaded preprocessing recipe to many CSV files.
+#
+#   python batch.py preprocessing_recipe.json data/*.csv --out-dir prepared
+#
+# Files are processed in parallel on a process pool; each file is streamed
+# chunk by chunk, so memory stays bounded by --chunksize whatever the file size.
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import dates
+import recipe
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def output_path(src, out_dir):
+    name = os.path.basename(src)
+    for ext in (".gz", ".zst", ".bz2", ".xz", ".zip"):
+        if name.endswith(ext):
+            name = name[: -len(ext)]
+    stem, _ = os.path.splitext(name)
+    return os.path.join(out_dir, f"{stem}.prepared.csv")
+
+
+def prepare_file(src, steps, out_dir, chunksize=DEFAULT_CHUNK_ROWS):
+    dst = output_path(src, out_dir)
+    tmp = dst + ".part"
+    rows = 0
+    with open(tmp, "w", newline="") as out:
+        # same date detection as the dashboard ingest, so recipes see the same dtypes
+        chunks = dates.parse_date_stream(pd.read_csv(src, chunksize=chunksize))
+        for i, chunk in enumerate(chunks):
+            chunk = recipe.apply_recipe(chunk, steps)
+            chunk.to_csv(out, index=False, header=(i == 0))
+            rows += len(chunk)
+    os.replace(tmp, dst)
+    return dst, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a preprocessing recipe to CSV files.")
+    parser.add_argument("recipe", help="recipe JSON downloaded from the Preprocessing page")
+    parser.add_argument("files", nargs="+", help="CSV files to prepare")
+    parser.add_argument("--out-dir", default="prepared", help="output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parallel processes")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per chunk")
+    args = parser.parse_args(argv)
+
+    steps = recipe.load(args.recipe)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(prepare_file, src, steps, args.out_dir, args.chunksize): src
+            for src in args.files
+        }
+        for fut in as_completed(futures):
+            src = futures[fut]
+            try:
+                dst, rows = fut.result()
+            except Exception as exc:
+                failed += 1
+                print(f"FAILED {src}: {exc}", file=sys.stderr)
+            else:
+                print(f"{src} -> {dst} ({rows} rows)")
+
+    elapsed = time.perf_counter() - start
+    print(f"Prepared {len(args.files) - failed}/{len(args.files)} files in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# coordinator.py
+# Per-tab coordination of expensive callbacks.
+#
+# Scrolling through a dropdown fires one callback per intermediate value, but
+# only the last one is ever shown.  ``@coordinated(output)`` tracks the newest
+# request per (tab, output).  The tab is the random id in the ``tab-id`` store,
+# created when the layout is served: all tabs of a browser share the session
+# cookie, but must not supersede each other.
+#
+# * a request that has been superseded is dropped (PreventUpdate) before it
+#   starts and again before its result is serialized;
+# * identical requests in flight (same output, same inputs - the inputs include
+#   the dataset version handle) share one computation, across sessions;
+# * a shared computation whose every waiter has been superseded is cancelled at
+#   the next ``checkpoint()`` - chunked scans call it between chunks.
+import functools
+import json
+import threading
+from collections import Counter
+
+from dash.exceptions import PreventUpdate
+from flask import has_request_context
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """Raised inside a computation whose result nobody is waiting for any more."""
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = []
+
+
+class RequestCoordinator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (tab, output) -> [newest generation, requests in progress]; removed when idle
+        self._latest = {}
+        self._flights = {}
+        self.stats = Counter()
+
+    def _is_current(self, ticket):
+        tab, output, generation = ticket
+        if tab is None:
+            return True
+        latest = self._latest.get((tab, output))
+        return latest is not None and latest[0] == generation
+
+    def _enter(self, tab, output):
+        with self._lock:
+            if tab is None:
+                return (None, output, 0)
+            latest = self._latest.setdefault((tab, output), [0, 0])
+            latest[0] += 1
+            latest[1] += 1
+            return (tab, output, latest[0])
+
+    def _leave(self, ticket):
+        tab, output, _ = ticket
+        with self._lock:
+            latest = self._latest.get((tab, output))
+            if latest is not None:
+                latest[1] -= 1
+                if not latest[1]:
+                    del self._latest[(tab, output)]
+
+    def abandoned(self, flight):
+        with self._lock:
+            return not any(self._is_current(t) for t in flight.waiters)
+
+    def run(self, tab, output, key, compute):
+        ticket = self._enter(tab, output)
+        try:
+            return self._run(ticket, key, compute)
+        finally:
+            self._leave(ticket)
+
+    def _run(self, ticket, key, compute):
+        while True:
+            with self._lock:
+                if not self._is_current(ticket):
+                    self.stats["dropped"] += 1
+                    raise PreventUpdate
+                flight = self._flights.get(key)
+                owner = flight is None
+                if owner:
+                    flight = self._flights[key] = _Flight()
+                flight.waiters.append(ticket)
+
+            if owner:
+                self._fly(key, flight, compute)
+            else:
+                self.stats["shared"] += 1
+                flight.done.wait()
+
+            with self._lock:
+                current = self._is_current(ticket)
+            if not current:
+                self.stats["dropped"] += 1
+                raise PreventUpdate
+            if isinstance(flight.error, Cancelled):
+                # cancelled just before this request joined it: compute again
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+    def _fly(self, key, flight, compute):
+        _local.flight = (self, flight)
+        try:
+            flight.result = compute()
+            self.stats["computed"] += 1
+        except Cancelled as exc:
+            flight.error = exc
+            self.stats["cancelled"] += 1
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            _local.flight = None
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+coordinator = RequestCoordinator()
+
+
+def checkpoint():
+    """Raise ``Cancelled`` if the running coordinated computation was abandoned."""
+    state = getattr(_local, "flight", None)
+    if state is not None and state[0].abandoned(state[1]):
+        raise Cancelled()
+
+
+def coordinated(output):
+    """Decorator for a callback whose result goes to ``output``.
+
+    The callback declares ``State("tab-id", "data")`` last; that argument is
+    consumed here and not passed on.
+    """
+
+    def wrap(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            *args, tab = args
+            if not has_request_context():
+                return func(*args, **kwargs)
+            key = (output, json.dumps([args, kwargs], sort_keys=True, default=str))
+            return coordinator.run(tab, output, key, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return wrap
@@ -0,0 +1,111 @@
+# cube.py
+# Small OLAP-style cube over the low-cardinality categorical columns.
+#
+# One group-by over all dimensions at once stores count / sum / min / max of
+# every numeric measure per cell (chunk by chunk for on-disk datasets, merging
+# the partial cells).  Any single dimension is then a cheap roll-up of those
+# cells, and mean is sum / count, so bar plots and grouped summaries are
+# answered from a few hundred cells instead of the raw rows.
+import pandas as pd
+
+import recipe
+from datasets import registry
+from outofcore import ChunkedDataset
+
+CUBE_MAX_CARDINALITY = 20
+CUBE_MAX_DIMENSIONS = 6
+CUBE_AGGREGATES = {
+    "count": "Count",
+    "sum": "Sum",
+    "mean": "Mean",
+    "min": "Min",
+    "max": "Max",
+}
+CELL_STATS = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+MISSING_LABEL = "(missing)"
+
+
+class Cube:
+    def __init__(self, cells, dimensions, measures):
+        # cells: index = dimension values, columns = (stat, measure)
+        self.cells = cells
+        self.dimensions = dimensions
+        self.measures = measures
+
+    def covers(self, dimension, measure):
+        return dimension in self.dimensions and measure in self.measures
+
+    def summary(self, dimension, measure):
+        """count / sum / mean / min / max of ``measure`` per value of ``dimension``."""
+        stats = self.cells.xs(measure, axis=1, level=1)
+        rolled = stats.groupby(level=dimension, dropna=False).agg(CELL_STATS)
+        rolled["mean"] = rolled["sum"] / rolled["count"].where(rolled["count"] > 0)
+        rolled = rolled[list(CUBE_AGGREGATES)]
+        rolled.index = rolled.index.astype(object).fillna(MISSING_LABEL).astype(str)
+        return rolled
+
+
+# -------------------------------------------------------------------
+# Building
+# -------------------------------------------------------------------
+def pick_dimensions(frame):
+    """Lowest-cardinality categorical columns of a (sample) frame."""
+    candidates = frame.select_dtypes(include=["object", "category", "bool"])
+    cardinality = candidates.nunique(dropna=False)
+    cardinality = cardinality[cardinality <= CUBE_MAX_CARDINALITY].sort_values(kind="stable")
+    return list(cardinality.index[:CUBE_MAX_DIMENSIONS])
+
+
+def _cells(frame, dimensions, measures):
+    grouped = frame.groupby(dimensions, dropna=False, observed=True)[measures]
+    cells = grouped.agg(list(CELL_STATS))
+    return cells.swaplevel(0, 1, axis=1)
+
+
+def _merge(parts, dimensions):
+    merged = pd.concat(parts)
+    how = {col: CELL_STATS[col[0]] for col in merged.columns}
+    return merged.groupby(level=list(range(len(dimensions))), dropna=False).agg(how)
+
+
+def build_cube(ds):
+    if isinstance(ds, ChunkedDataset):
+        sample = ds.head(50_000)
+    else:
+        sample = ds
+    dimensions = pick_dimensions(sample)
+    measures = list(sample.select_dtypes(include="number").columns)
+    if not dimensions or not measures:
+        return Cube(pd.DataFrame(), dimensions, measures)
+
+    if isinstance(ds, ChunkedDataset):
+        parts = [_cells(chunk, dimensions, measures) for chunk in ds.iter_chunks(dimensions + measures)]
+        cells = _merge(parts, dimensions)
+    else:
+        cells = _cells(ds, dimensions, measures)
+    return Cube(cells, dimensions, measures)
+
+
+def _schema(ds):
+    return {col: str(dtype) for col, dtype in ds.dtypes.items()}
+
+
+def get_cube(handle):
+    """Cube for a dataset version, built once and cached in the registry."""
+    def build():
+        # preprocessed versions are reached through the JSON API (the EDA pages
+        # read the upload's first version)
+        parent, step = registry.lineage(handle)
+        if parent is not None and step is not None:
+            touched = recipe.touched_columns(step)
+            if touched is not None:
+                previous = get_cube(parent)
+                used = set(previous.dimensions) | set(previous.measures)
+                # the step left every cube column alone and the schema as it was:
+                # a new or retyped column could be a dimension or measure of its own
+                same_schema = _schema(registry.resolve(parent)) == _schema(registry.resolve(handle))
+                if touched.isdisjoint(used) and same_schema:
+                    return previous
+        return build_cube(registry.resolve(handle))
+
+    return registry.cached(handle, ("cube",), build)
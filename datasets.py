@@ -0,0 +1,481 @@
+# datasets.py
+# Server-side registry of dataset versions and their cached aggregates.
+#
+# The browser stores only hold a small handle ``{"dataset": id, "version": n}``.
+# Versions are immutable: an upload creates a new dataset, every preprocessing
+# step adds a version to it.  A session's first step on data it does not own
+# (the shared default datasets) starts a new dataset owned by that session, so
+# the versions of a dataset all belong to the session that created it.  Because a version never changes, any result
+# computed from it can be cached under (dataset, version, key) for good.
+#
+# Every version is owned by the browser session that created it (the default
+# datasets are shared).  In-memory DataFrames count against a per-session and
+# a global byte budget; when a budget is exceeded the least recently used
+# versions are spilled to chunked Parquet files (see outofcore.py) and served
+# from disk, and reloaded into memory on access when they fit again.  Versions
+# of sessions idle for longer than the TTL are dropped.
+#
+# The registry lives in the memory of one process, and a handle only resolves
+# there.  The app must therefore run as a single process with threads (the
+# Flask dev server with threaded=True, or e.g. ``gunicorn -w 1 --threads 8
+# app:server``); ``claim_server`` makes a second process on the same port
+# refuse requests instead of answering them with empty or "expired" data.
+import fcntl
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from outofcore import CHUNK_ROWS, OOC_ROOT, PROCESS_ROOT, ChunkedDataset
+
+RESULT_CACHE_ENTRIES = int(os.environ.get("DASH_RESULT_CACHE_ENTRIES", 512))
+SESSION_MEMORY_BUDGET = int(os.environ.get("DASH_SESSION_MEMORY_BYTES", 1024 ** 3))
+GLOBAL_MEMORY_BUDGET = int(os.environ.get("DASH_GLOBAL_MEMORY_BYTES", 4 * 1024 ** 3))
+SESSION_TTL_SECONDS = int(os.environ.get("DASH_SESSION_TTL_SECONDS", 4 * 3600))
+SPILL_ROOT = os.path.join(PROCESS_ROOT, "spill")
+
+
+_claims = {}
+_claims_lock = threading.Lock()
+
+
+def claim_server(port):
+    """Whether this process is the only one serving ``port`` (held until it exits)."""
+    with _claims_lock:
+        if port not in _claims:
+            os.makedirs(OOC_ROOT, exist_ok=True)
+            fh = open(os.path.join(OOC_ROOT, f"server-{port}.lock"), "w")
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                _claims[port] = fh  # the open file keeps the lock
+            except OSError:
+                fh.close()
+                _claims[port] = None
+        return _claims[port] is not None
+
+
+def frame_bytes(data, base=None):
+    """In-memory size of ``data``, leaving out the columns it shares with ``base``.
+
+    Preprocessing steps shallow-copy their input, so a version usually holds
+    the same column arrays as its parent; those are charged to the parent only,
+    and to the child again once the parent leaves memory (see _recharge_children).
+    """
+    if not isinstance(data, pd.DataFrame):
+        return 0
+    usage = data.memory_usage(deep=True)
+    if isinstance(base, pd.DataFrame):
+        shared = [
+            col for col in data.columns
+            if col in base.columns
+            and isinstance(data[col].array, pd.arrays.NumpyExtensionArray)
+            and np.shares_memory(data[col].to_numpy(), base[col].to_numpy())
+        ]
+        usage = usage.drop(shared)
+    return int(usage.sum())
+
+
+class DatasetRegistry:
+    def __init__(
+        self,
+        cache_entries=RESULT_CACHE_ENTRIES,
+        session_budget=SESSION_MEMORY_BUDGET,
+        global_budget=GLOBAL_MEMORY_BUDGET,
+        session_ttl=SESSION_TTL_SECONDS,
+    ):
+        self.cache_entries = cache_entries
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.session_ttl = session_ttl
+        self._lock = threading.RLock()
+        self._datasets = {}
+        self._results = OrderedDict()
+        self._last_seen = {}
+        # bytes promised to uploads being read, per owner (see reserve)
+        self._reserved = {}
+
+    # ---------------------------------------------------------------
+    # Versions
+    # ---------------------------------------------------------------
+    def add(self, data, parent=None, dataset_id=None, name=None, step=None, owner=None, reserved=0):
+        """Register ``data`` (DataFrame or ChunkedDataset) and return its handle.
+
+        With ``parent`` the data becomes a new version of the parent's dataset
+        (of a new dataset derived from it when ``owner`` does not own the
+        parent's dataset), otherwise a new dataset is created.  ``step`` is the recipe step that
+        derived it from the parent; ``owner`` the session it is charged to.
+        ``reserved`` bytes of the owner's reservation are released for it.
+        """
+        base = None
+        branch = False
+        if parent is not None:
+            with self._lock:
+                versions = self._datasets[parent["dataset"]]["versions"]
+                base = versions[parent["version"] - 1]["data"]
+                branch = versions[0]["owner"] != owner
+                if branch:
+                    name = name or self._datasets[parent["dataset"]]["name"]
+        version = {
+            "data": data,
+            # handle of the version this one was derived from, possibly in another dataset
+            "parent": {"dataset": parent["dataset"], "version": parent["version"]} if parent else None,
+            "step": step,
+            "owner": owner,
+            "bytes": frame_bytes(data, base),
+            "spilled": False,
+            "pinned": False,
+            # set when Parquet cannot store the frame: it is never picked again
+            "unspillable": False,
+            # Parquet copy, kept after a reload so that readers of it are not cut
+            # off and a second spill costs nothing; removed when the version expires
+            "disk": None,
+            "reload_lock": threading.Lock(),
+            # datasets drawn from this version (its samples), see derived()
+            "derived": {},
+            "derive_lock": threading.Lock(),
+            "last_used": time.monotonic(),
+            # tells this version apart from one with the same number after a restart
+            "uid": uuid.uuid4().hex,
+        }
+        with self._lock:
+            if parent is not None and not branch:
+                dataset_id = parent["dataset"]
+                entry = self._datasets[dataset_id]
+            else:
+                dataset_id = dataset_id or uuid.uuid4().hex[:12]
+                entry = self._datasets.setdefault(
+                    dataset_id, {"name": name or dataset_id, "versions": []}
+                )
+            entry["versions"].append(version)
+            self._release(owner, reserved)
+            self._touch_session(owner)
+            handle = {"dataset": dataset_id, "version": len(entry["versions"])}
+        self.enforce_budgets()
+        return handle
+
+    def resolve(self, handle):
+        """Return the data behind a store handle; ``KeyError`` if it is unknown."""
+        if not isinstance(handle, dict) or "dataset" not in handle:
+            raise KeyError(handle)
+        return self.get(handle["dataset"], handle.get("version"))[1]
+
+    def _version(self, dataset_id, version):
+        # (number, entry) of a live version, the latest when None; call with the lock held
+        versions = self._datasets[dataset_id]["versions"]
+        if version is None:
+            version = len(versions)
+        if not 1 <= version <= len(versions) or versions[version - 1]["data"] is None:
+            raise KeyError((dataset_id, version))
+        return version, versions[version - 1]
+
+    def get(self, dataset_id, version=None):
+        """Return ``(version, data)``; the latest version when ``version`` is None."""
+        with self._lock:
+            version, entry = self._version(dataset_id, version)
+            entry["last_used"] = time.monotonic()
+            self._touch_session(entry["owner"])
+            reload = entry["spilled"] and self._fits(entry)
+            data = entry["data"]
+
+        if reload:
+            data = self._reload(entry, data)
+        return version, data
+
+    def handle(self, dataset_id, version=None):
+        """Handle of ``version`` (the latest when None) without loading it; ``KeyError`` if unknown."""
+        with self._lock:
+            version, entry = self._version(dataset_id, version)
+            self._touch_session(entry["owner"])
+        return {"dataset": dataset_id, "version": version}
+
+    def alive(self, handle):
+        """Whether ``handle`` still resolves; unlike ``get`` it does not count as a use."""
+        if not isinstance(handle, dict):
+            return False
+        with self._lock:
+            entry = self._datasets.get(handle.get("dataset"))
+            version = handle.get("version")
+            if entry is None or not isinstance(version, int) or not 1 <= version <= len(entry["versions"]):
+                return False
+            return entry["versions"][version - 1]["data"] is not None
+
+    def derived(self, handle, key, build):
+        """Handle of the dataset ``build()`` derives from ``handle``, built once per ``key``.
+
+        Kept on the version itself rather than in the result cache, so it is
+        never rebuilt after an eviction and is dropped when the version expires.
+        """
+        with self._lock:
+            entry = self._datasets[handle["dataset"]]["versions"][handle["version"] - 1]
+        with entry["derive_lock"]:
+            with self._lock:
+                if key in entry["derived"]:
+                    return entry["derived"][key]
+            view = build()
+            with self._lock:
+                entry["derived"][key] = view
+        return view
+
+    def lineage(self, handle):
+        """``(parent_handle, step)`` for a derived version, ``(None, None)`` otherwise."""
+        with self._lock:
+            entry = self._datasets[handle["dataset"]]["versions"][handle["version"] - 1]
+        if entry["parent"] is None:
+            return None, None
+        return entry["parent"], entry["step"]
+
+    def uid(self, handle):
+        with self._lock:
+            return self._datasets[handle["dataset"]]["versions"][handle["version"] - 1]["uid"]
+
+    def owner(self, handle):
+        with self._lock:
+            return self._datasets[handle["dataset"]]["versions"][handle["version"] - 1]["owner"]
+
+    def dataset_owner(self, dataset_id):
+        """Session that created ``dataset_id`` (None for shared data); ``KeyError`` if unknown."""
+        with self._lock:
+            return self._datasets[dataset_id]["versions"][0]["owner"]
+
+    def datasets(self):
+        with self._lock:
+            return [
+                {
+                    "id": dataset_id,
+                    "name": entry["name"],
+                    "versions": sum(v["data"] is not None for v in entry["versions"]),
+                }
+                for dataset_id, entry in self._datasets.items()
+            ]
+
+    # ---------------------------------------------------------------
+    # Memory budgets
+    # ---------------------------------------------------------------
+    def _touch_session(self, owner):
+        if owner is not None:
+            self._last_seen[owner] = time.monotonic()
+
+    def _all_versions(self):
+        for entry in self._datasets.values():
+            yield from entry["versions"]
+
+    def _in_memory(self, owner=...):
+        return [
+            v for v in self._all_versions()
+            if isinstance(v["data"], pd.DataFrame) and (owner is ... or v["owner"] == owner)
+        ]
+
+    def _used(self, owner=...):
+        # in-memory bytes plus reservations, of one owner or in total
+        if owner is ...:
+            reserved = sum(self._reserved.values())
+        else:
+            reserved = self._reserved.get(owner, 0)
+        return sum(v["bytes"] for v in self._in_memory(owner)) + reserved
+
+    def _fits(self, entry):
+        if self._used() + entry["bytes"] > self.global_budget:
+            return False
+        if entry["owner"] is None:
+            return True
+        return self._used(entry["owner"]) + entry["bytes"] <= self.session_budget
+
+    def _spillable(self, owner=...):
+        # in-memory bytes of one owner or in total that a spill could free
+        return sum(
+            v["bytes"] for v in self._in_memory(owner) if not (v["pinned"] or v["unspillable"])
+        )
+
+    def headroom(self, owner):
+        """Bytes ``owner`` can hold in memory, counting what spilling LRU versions would free."""
+        with self._lock:
+            left = self.global_budget - self._used() + self._spillable()
+            if owner is not None:
+                left = min(left, self.session_budget - self._used(owner) + self._spillable(owner))
+        return max(left, 0)
+
+    def reserve(self, owner, nbytes):
+        """Set ``nbytes`` aside for data ``owner`` is about to load; False if they do not fit.
+
+        Least recently used versions are spilled to make room before this
+        returns, so the data about to be read stays in memory rather than older
+        versions.  Concurrent uploads each see the others' reservations, so they
+        cannot all be admitted into the same headroom.  ``add(..., reserved=nbytes)``
+        or ``release`` gives the reservation back.
+        """
+        with self._lock:
+            if nbytes > self.headroom(owner):
+                return False
+            self._reserved[owner] = self._reserved.get(owner, 0) + nbytes
+        self.enforce_budgets()
+        return True
+
+    def release(self, owner, nbytes):
+        with self._lock:
+            self._release(owner, nbytes)
+
+    def _release(self, owner, nbytes):
+        if nbytes:
+            left = self._reserved.get(owner, 0) - nbytes
+            if left > 0:
+                self._reserved[owner] = left
+            else:
+                self._reserved.pop(owner, None)
+
+    def _children(self, entry):
+        # in-memory versions derived directly from ``entry``; call with the lock held
+        for dataset_id, dataset in self._datasets.items():
+            for number, v in enumerate(dataset["versions"], 1):
+                if v is entry:
+                    handle = {"dataset": dataset_id, "version": number}
+                    return [c for c in self._in_memory() if c["parent"] == handle]
+        return []
+
+    def _recharge_children(self, children):
+        """Charge ``children`` in full: the parent whose arrays they share left memory."""
+        for child, data in [(c, c["data"]) for c in children]:
+            nbytes = frame_bytes(data)
+            with self._lock:
+                if child["data"] is data:
+                    child["bytes"] = nbytes
+
+    def _pick_victim(self):
+        """Least recently used in-memory version of an over-budget session, or globally."""
+        resident = [v for v in self._in_memory() if not (v["pinned"] or v["unspillable"])]
+        by_owner = dict(self._reserved)
+        for v in self._in_memory():
+            by_owner[v["owner"]] = by_owner.get(v["owner"], 0) + v["bytes"]
+
+        for owner, used in by_owner.items():
+            if owner is not None and used > self.session_budget:
+                candidates = [v for v in resident if v["owner"] == owner]
+                if candidates:
+                    return min(candidates, key=lambda v: v["last_used"])
+        if sum(by_owner.values()) > self.global_budget and resident:
+            return min(resident, key=lambda v: v["last_used"])
+        return None
+
+    def enforce_budgets(self):
+        """Drop expired sessions, then spill LRU versions until every budget holds."""
+        self.expire_sessions()
+        while True:
+            with self._lock:
+                victim = self._pick_victim()
+                if victim is None:
+                    return
+                # keep other threads from picking the same version while it is written
+                victim["pinned"] = True
+            self._spill(victim)
+
+    def _spill(self, entry):
+        df = entry["data"]
+        spilled = entry["disk"]
+        if spilled is None:
+            try:
+                os.makedirs(SPILL_ROOT, exist_ok=True)
+                spilled = ChunkedDataset.from_frames(
+                    (df.iloc[i:i + CHUNK_ROWS] for i in range(0, max(len(df), 1), CHUNK_ROWS)),
+                    root=SPILL_ROOT,
+                )
+            except Exception:
+                # e.g. mixed-type object columns Parquet cannot store: keep it in memory
+                with self._lock:
+                    entry["unspillable"] = True
+                    entry["pinned"] = False
+                return
+        with self._lock:
+            entry["data"] = spilled
+            entry["disk"] = spilled
+            entry["spilled"] = True
+            entry["pinned"] = False
+            children = self._children(entry)
+        self._recharge_children(children)
+
+    def _reload(self, entry, data):
+        # one thread reads the parts back; the others wait for its frame
+        with entry["reload_lock"]:
+            with self._lock:
+                current = entry["data"]
+            if current is None:
+                raise KeyError("expired")
+            if current is not data:
+                return current
+            frame = pd.concat(list(data.iter_chunks()), ignore_index=True)
+            with self._lock:
+                if entry["data"] is data:
+                    entry["data"] = frame
+                    # shares nothing with its parent any more
+                    entry["bytes"] = frame_bytes(frame)
+                    entry["spilled"] = False
+                    entry["last_used"] = time.monotonic()
+        self.enforce_budgets()
+        return frame
+
+    def expire_sessions(self):
+        now = time.monotonic()
+        dropped, children = [], []
+        with self._lock:
+            expired = {s for s, seen in self._last_seen.items() if now - seen > self.session_ttl}
+            if not expired:
+                return
+            gone = [v for v in self._all_versions() if v["owner"] in expired and v["data"] is not None]
+            for v in gone:
+                if isinstance(v["data"], pd.DataFrame):
+                    children += self._children(v)
+            for v in gone:
+                dropped += [v["data"], v["disk"]]
+                v["data"] = v["disk"] = None
+                v["derived"] = {}
+            for owner in expired:
+                del self._last_seen[owner]
+            children = [c for c in children if c["data"] is not None]
+        self._recharge_children(children)
+        for data in dropped:
+            if isinstance(data, ChunkedDataset):
+                shutil.rmtree(data.path, ignore_errors=True)
+
+    def memory_report(self):
+        """Bytes held in memory / versions on disk, per session and in total."""
+        with self._lock:
+            sessions = {}
+            for v in self._all_versions():
+                if v["data"] is None:
+                    continue
+                owner = v["owner"] or "shared"
+                row = sessions.setdefault(owner, {"memory_bytes": 0, "in_memory": 0, "on_disk": 0})
+                if isinstance(v["data"], pd.DataFrame):
+                    row["memory_bytes"] += v["bytes"]
+                    row["in_memory"] += 1
+                else:
+                    row["on_disk"] += 1
+            return {
+                "memory_bytes": sum(row["memory_bytes"] for row in sessions.values()),
+                "global_budget": self.global_budget,
+                "session_budget": self.session_budget,
+                "sessions": sessions,
+            }
+
+    # ---------------------------------------------------------------
+    # Result cache
+    # ---------------------------------------------------------------
+    def cached(self, handle, key, compute):
+        """Memoize ``compute()`` for one dataset version (LRU over all versions)."""
+        cache_key = (handle["dataset"], handle["version"], key)
+        with self._lock:
+            if cache_key in self._results:
+                self._results.move_to_end(cache_key)
+                return self._results[cache_key]
+        value = compute()
+        with self._lock:
+            self._results[cache_key] = value
+            while len(self._results) > self.cache_entries:
+                self._results.popitem(last=False)
+        return value
+
+
+registry = DatasetRegistry()
@@ -0,0 +1,76 @@
+# dates.py
+# Date column detection and fast, format-hinted parsing.
+#
+# ``pd.to_datetime`` without a format infers the layout element by element,
+# which is slow on large columns.  Here the format is guessed once from a small
+# sample of a column, checked against that sample, and the whole column is then
+# parsed in a single vectorized pass with it.
+#
+# At ingest a column only becomes a date column if every sampled value parses,
+# and it keeps its text if any value in the full column does not: nothing is
+# turned into NaT without asking.  Coercing stray values to NaT is left to the
+# explicit Datetime conversion on the Preprocessing page.
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+DATE_SAMPLE_ROWS = 1000
+# share of sampled values the guessed format must parse for an explicit conversion
+DATE_MIN_MATCH = 0.95
+
+
+def infer_date_format(series, min_match=DATE_MIN_MATCH):
+    """Guess a strptime format from a sample of ``series``; None if it is not a date."""
+    sample = series.dropna()
+    if not len(sample) or not (pd.api.types.is_object_dtype(sample) or pd.api.types.is_string_dtype(sample)):
+        return None
+    sample = sample.astype(str).head(DATE_SAMPLE_ROWS)
+    fmt = guess_datetime_format(sample.iloc[0])
+    if fmt is None:
+        return None
+    parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+    return fmt if parsed.notna().mean() >= min_match else None
+
+
+def to_datetime(series, fmt=None):
+    """Vectorized ``pd.to_datetime`` with ``fmt`` (inferred if not given); bad values become NaT."""
+    fmt = fmt or infer_date_format(series)
+    if fmt is None:
+        return pd.to_datetime(series, errors="coerce")
+    return pd.to_datetime(series, format=fmt, errors="coerce")
+
+
+def detect_date_formats(df):
+    """``{column: format}`` for the text columns of ``df`` whose sampled values are all dates."""
+    formats = {}
+    for col in df.select_dtypes(include="object").columns:
+        fmt = infer_date_format(df[col], min_match=1.0)
+        if fmt is not None:
+            formats[col] = fmt
+    return formats
+
+
+def parse_date_columns(df, formats=None):
+    """Parse the detected (or given) date columns of ``df`` in place of the text.
+
+    A column any of whose values does not parse is left as text.
+    """
+    formats = detect_date_formats(df) if formats is None else formats
+    for col, fmt in formats.items():
+        parsed = pd.to_datetime(df[col], format=fmt, errors="coerce")
+        if parsed.isna().sum() == df[col].isna().sum():
+            df[col] = parsed
+    return df
+
+
+def parse_date_stream(chunks, formats=None):
+    """Detect date formats on the first chunk (unless given) and reuse them for the rest.
+
+    A column left as text in one chunk stays text in the chunks after it
+    (the ones before it are already written; they are read back as objects).
+    """
+    for chunk in chunks:
+        if formats is None:
+            formats = detect_date_formats(chunk)
+        chunk = parse_date_columns(chunk, formats)
+        formats = {c: f for c, f in formats.items() if pd.api.types.is_datetime64_any_dtype(chunk[c])}
+        yield chunk
@@ -0,0 +1,39 @@
+# figures.py
+# Figure styling shared by the analysis pages, and the partial updates for it.
+#
+# Template and height are chosen on the page and applied to every figure when
+# it is built.  Changing only one of them, or switching between views that draw
+# the same traces, is sent to the browser as a ``dash.Patch``: the trace data
+# already there is kept and only the changed properties travel.
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from dash import Patch
+
+FIGURE_TEMPLATES = ["simple_white", "plotly_white", "ggplot2", "seaborn", "plotly_dark"]
+DEFAULT_TEMPLATE = "simple_white"
+DEFAULT_HEIGHT = 450
+HEIGHTS = [350, 450, 600, 800]
+
+
+def style(fig, template=None, height=None):
+    fig.update_layout(template=template or DEFAULT_TEMPLATE, height=height or DEFAULT_HEIGHT)
+    return fig
+
+
+def style_patch(template=None, height=None):
+    patch = Patch()
+    patch["layout"]["template"] = pio.templates[template or DEFAULT_TEMPLATE]
+    patch["layout"]["height"] = height or DEFAULT_HEIGHT
+    return patch
+
+
+def density_trace(counts, edges):
+    """Smoothed outline of a histogram, drawn over its bars for the distribution view."""
+    counts = np.asarray(counts, dtype=float)
+    if not len(counts):
+        return go.Scatter(x=[], y=[], mode="lines", name="density")
+    centers = (edges[:-1] + edges[1:]) / 2
+    kernel = np.array([1, 4, 6, 4, 1], dtype=float)
+    smooth = np.convolve(np.pad(counts, 2, mode="edge"), kernel / kernel.sum(), mode="valid")
+    return go.Scatter(x=centers[: len(smooth)], y=smooth, mode="lines", name="density", line={"width": 3})
@@ -0,0 +1,194 @@
+# ingest.py
+# Multi-threaded, schema-hinted CSV reading.
+#
+# The column types are inferred once from a small sample (plain pandas, plus
+# the date formats from dates.py) and handed to pyarrow's CSV reader, which
+# parses blocks of the file on all cores and converts straight to the hinted
+# types.  Date columns are read as text and parsed afterwards, each with its
+# own sampled format (handing pyarrow every format would try them all on every
+# column, so a day-first column could be read month-first).  gzip and zstd inputs are
+# decompressed on the fly.  When pyarrow rejects the file (a hint that does not
+# hold beyond the sample, an unusual dialect) it is read again with the pandas
+# C parser, exactly as before.
+import io
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+from pandas._libs.parsers import STR_NA_VALUES
+from pyarrow import csv as pacsv
+
+import dates
+from outofcore import CHUNK_ROWS, ChunkedDataset
+
+INGEST_SAMPLE_BYTES = 1024 ** 2
+# pyarrow parses a file in blocks of this size, one per thread
+INGEST_BLOCK_BYTES = int(os.environ.get("DASH_INGEST_BLOCK_BYTES", 16 * 1024 ** 2))
+
+MAGIC = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+NULL_VALUES = sorted(STR_NA_VALUES)
+
+
+def compression(head):
+    for magic, codec in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def open_stream(source, counter=None):
+    """Decompressing pyarrow input stream over a path or an in-memory upload.
+
+    With a ``counter`` list, ``counter[0]`` adds up the CSV bytes read.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        raw = pa.BufferReader(source)
+        head = bytes(source[:4])
+    else:
+        raw = pa.OSFile(source)
+        head = raw.read(4)
+        raw.seek(0)
+    codec = compression(head)
+    stream = pa.CompressedInputStream(raw, codec) if codec else raw
+    if counter is None:
+        return stream
+
+    def count(buf):
+        counter[0] += buf.size
+        return buf
+
+    return pa.TransformInputStream(stream, count)
+
+
+def csv_size(source, limit):
+    """CSV bytes in ``source`` after decompression, counted only up to just past ``limit``.
+
+    A compressed upload can be many times its own size in memory, so this is
+    what the in-memory / chunked decision is based on.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        size, head = len(source), bytes(source[:4])
+    else:
+        size = os.path.getsize(source)
+        with open(source, "rb") as f:
+            head = f.read(4)
+    if compression(head) is None:
+        return size
+    size = 0
+    with open_stream(source) as stream:
+        while size <= limit:
+            block = stream.read(INGEST_BLOCK_BYTES)
+            if not block:
+                break
+            size += len(block)
+    return size
+
+
+def frame_bytes_estimate(source, csv_bytes):
+    """DataFrame bytes ``csv_bytes`` of this CSV will take, from a sample of its rows.
+
+    Text columns take several times their CSV size as Python strings.
+    """
+    head, sample = _sample(source)
+    if not len(head):
+        return 0
+    return int(csv_bytes * sample.memory_usage(deep=True).sum() / len(head))
+
+
+# -------------------------------------------------------------------
+# Schema hints
+# -------------------------------------------------------------------
+def _sample(source):
+    with open_stream(source) as stream:
+        head = stream.read(INGEST_SAMPLE_BYTES)
+    # drop the last, possibly cut-off line unless the sample is the whole file
+    if len(head) == INGEST_SAMPLE_BYTES and b"\n" in head:
+        head = head[: head.rindex(b"\n") + 1]
+    return head, pd.read_csv(io.BytesIO(head))
+
+
+def infer_schema(source):
+    """``(column_types, date_formats)`` from the first rows of ``source``."""
+    _, sample = _sample(source)
+    formats = dates.detect_date_formats(sample)
+
+    types = {}
+    for col in sample.columns:
+        values = sample[col]
+        if col in formats:
+            types[col] = pa.string()  # parsed per column by dates.parse_date_columns
+        elif values.isna().all():
+            continue  # nothing to go on: let pyarrow infer it
+        elif pd.api.types.is_bool_dtype(values):
+            types[col] = pa.bool_()
+        elif pd.api.types.is_integer_dtype(values):
+            types[col] = pa.int64()
+        elif pd.api.types.is_float_dtype(values):
+            types[col] = pa.float64()
+        else:
+            types[col] = pa.string()
+    return types, formats
+
+
+def arrow_options(types):
+    read = pacsv.ReadOptions(use_threads=True, block_size=INGEST_BLOCK_BYTES)
+    convert = pacsv.ConvertOptions(
+        column_types=types,
+        null_values=NULL_VALUES,
+        strings_can_be_null=True,
+    )
+    return read, convert
+
+
+def to_frame(table):
+    frame = table.to_pandas()
+    # pyarrow gives None for missing text, pandas NaN
+    for col in frame.select_dtypes(include="object").columns:
+        frame[col] = frame[col].fillna(float("nan"))
+    return frame
+
+
+# -------------------------------------------------------------------
+# Reading
+# -------------------------------------------------------------------
+def read_csv(source, chunked=False, root=None):
+    """Read a CSV path or upload into a DataFrame, or a ChunkedDataset if ``chunked``.
+
+    Returns ``(data, stats)``; ``stats`` has the engine used, the CSV size in
+    bytes (after decompression) and the parse time in seconds.
+    """
+    start = time.perf_counter()
+    size = [0]
+    try:
+        types, formats = infer_schema(source)
+        read, convert = arrow_options(types)
+        with open_stream(source, size) as stream:
+            if chunked:
+                frames = (to_frame(pa.Table.from_batches([batch]))
+                          for batch in pacsv.open_csv(stream, read_options=read, convert_options=convert))
+                data = ChunkedDataset.from_frames(dates.parse_date_stream(frames, formats), root=root)
+            else:
+                frame = to_frame(pacsv.read_csv(stream, read_options=read, convert_options=convert))
+                data = dates.parse_date_columns(frame, formats)
+        engine = "pyarrow"
+    except (pa.ArrowException, ValueError):
+        size = [0]
+        data = _pandas_read(source, chunked, root, size)
+        engine = "pandas"
+    seconds = time.perf_counter() - start
+    return data, {"engine": engine, "bytes": size[0], "seconds": seconds}
+
+
+def _pandas_read(source, chunked, root, counter):
+    with open_stream(source, counter) as stream:
+        if chunked:
+            return ChunkedDataset.from_csv(stream, chunksize=CHUNK_ROWS, root=root)
+        return dates.parse_date_columns(pd.read_csv(stream))
+
+
+def describe(stats):
+    """``"12.3 MB in 0.40 s (30.8 MB/s, pyarrow)"`` for the upload status."""
+    mb = stats["bytes"] / 1024 ** 2
+    rate = mb / stats["seconds"] if stats["seconds"] > 0 else float("inf")
+    return f"{mb:.1f} MB in {stats['seconds']:.2f} s ({rate:.1f} MB/s, {stats['engine']})"
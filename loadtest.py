@@ -0,0 +1,443 @@
+# loadtest.py
+# Load test: replay analyst sessions against a running dashboard.
+#
+#   python loadtest.py --start --sessions 8 --iterations 2
+#   python loadtest.py --url http://127.0.0.1:8050 --pid 12345 --sessions 16
+#
+# Every simulated session behaves like a browser tab.  It loads the layout and
+# the callback graph from /_dash-dependencies (the callback signatures declared
+# in app.py), keeps the component props it has seen, and posts to
+# /_dash-update-component whatever the renderer would post when a prop changes,
+# including the callbacks chained off their outputs and the initial callbacks of
+# newly rendered pages.  The script uploads a CSV, switches variables and plot
+# types, applies preprocessing steps and downloads the results.  Bursts of
+# variable changes are sent without waiting for the responses, as when
+# scrolling through a dropdown.
+#
+# Reported: p50 / p95 / p99 latency per callback, request throughput and the
+# resident memory of the server process (with --pid, or --start).
+import argparse
+import base64
+import http.cookiejar
+import json
+import mimetypes
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+DEFAULT_URL = "http://127.0.0.1:8050"
+MAX_CHAIN = 10
+
+
+# -------------------------------------------------------------------
+# Callback graph
+# -------------------------------------------------------------------
+def split_outputs(output):
+    """``[(id, property)]`` from a dependency output string like ``..a.b...c.d..``."""
+    if output.startswith("..") and output.endswith(".."):
+        parts = output[2:-2].split("...")
+    else:
+        parts = [output]
+    return [tuple(part.rsplit(".", 1)) for part in parts]
+
+
+def label(dep):
+    """Name a callback by its first output that no other callback writes to."""
+    for component, prop in dep["outputs"]:
+        if "@" not in prop:
+            return f"{component}.{prop}"
+    component, prop = dep["outputs"][0]
+    return f"{component}.{prop.split('@')[0]} <- {dep['inputs'][0]['id']}"
+
+
+def load_dependencies(raw):
+    deps = []
+    for dep in raw:
+        if dep.get("clientside_function"):
+            continue
+        dep = dict(dep, outputs=split_outputs(dep["output"]))
+        dep["label"] = label(dep)
+        deps.append(dep)
+    return deps
+
+
+def walk(tree):
+    """Yield ``(id, props)`` for every component with an id in a layout tree."""
+    if isinstance(tree, list):
+        for item in tree:
+            yield from walk(item)
+    elif isinstance(tree, dict) and "props" in tree:
+        props = tree["props"]
+        if isinstance(props.get("id"), str):
+            yield props["id"], props
+        for value in props.values():
+            yield from walk(value)
+
+
+def option_values(options):
+    return [o["value"] if isinstance(o, dict) else o for o in options or []]
+
+
+# -------------------------------------------------------------------
+# One simulated browser tab
+# -------------------------------------------------------------------
+class Browser:
+    def __init__(self, base_url, deps, recorder, seed=0, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.deps = deps
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.timeout = timeout
+        self.props = {}
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        req = urllib.request.Request(
+            self.base_url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                payload = resp.read()
+                is_json = resp.headers.get_content_type() == "application/json"
+                return resp.status, json.loads(payload) if payload and is_json else None
+        except urllib.error.HTTPError as exc:
+            return exc.code, None
+
+    # ---------------------------------------------------------------
+    # Layout and state
+    # ---------------------------------------------------------------
+    def drop_tree(self, tree):
+        # components of replaced children are gone from the page, as are their callbacks
+        for component_id, _ in walk(tree):
+            self.props.pop(component_id, None)
+
+    def add_tree(self, tree):
+        new = set()
+        for component_id, props in walk(tree):
+            self.props[component_id] = props
+            new.add(component_id)
+        return new
+
+    def value(self, component_id, prop):
+        return self.props.get(component_id, {}).get(prop)
+
+    def present(self, dep):
+        ids = [c for c, _ in dep["outputs"]]
+        ids += [i["id"] for i in dep["inputs"] + dep["state"]]
+        return all(isinstance(i, str) and i in self.props for i in ids)
+
+    def open(self):
+        self.request("/")  # sets the session cookie
+        _, layout = self.request("/_dash-layout")
+        self.props = {}
+        new = self.add_tree(layout)
+        self.fire_initial(new)
+
+    # ---------------------------------------------------------------
+    # Callbacks
+    # ---------------------------------------------------------------
+    def body(self, dep, changed):
+        def spec(items):
+            return [
+                {"id": i["id"], "property": i["property"], "value": self.value(i["id"], i["property"])}
+                for i in items
+            ]
+
+        outputs = [{"id": c, "property": p} for c, p in dep["outputs"]]
+        return {
+            "output": dep["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": spec(dep["inputs"]),
+            "state": spec(dep["state"]),
+            "changedPropIds": sorted(changed),
+        }
+
+    def call(self, dep, changed):
+        return self.send(dep["label"], self.body(dep, changed))
+
+    def send(self, name, body):
+        start = time.perf_counter()
+        status, payload = self.request("/_dash-update-component", body)
+        self.recorder.record(name, status, time.perf_counter() - start)
+
+        updated, new = set(), set()
+        for component_id, props in ((payload or {}).get("response") or {}).items():
+            for prop, value in props.items():
+                if isinstance(value, dict) and "__dash_patch_update" in value:
+                    continue  # partial figure update: nothing later callbacks read
+                current = self.props.setdefault(component_id, {})
+                if prop == "children":
+                    self.drop_tree(current.get("children"))
+                current[prop] = value
+                updated.add(f"{component_id}.{prop}")
+                if prop == "children":
+                    new |= self.add_tree(value)
+        return updated, new
+
+    def triggered_by(self, changed):
+        return [
+            dep for dep in self.deps
+            if any(f"{i['id']}.{i['property']}" in changed for i in dep["inputs"]) and self.present(dep)
+        ]
+
+    def run_wave(self, todo):
+        """Run callbacks like the renderer: each once per wave, then what they triggered."""
+        for _ in range(MAX_CHAIN):
+            if not todo:
+                return
+            changed, new = set(), set()
+            for dep, trigger in todo.values():
+                updated, added = self.call(dep, trigger)
+                changed |= updated
+                new |= added
+            todo = {d["output"]: (d, changed) for d in self.triggered_by(changed)}
+            todo.update(self.initial(new))
+
+    def initial(self, new):
+        return {
+            dep["output"]: (dep, set())
+            for dep in self.deps
+            if not dep.get("prevent_initial_call")
+            and self.present(dep)
+            and any(i in new for i in [c for c, _ in dep["outputs"]] + [i["id"] for i in dep["inputs"]])
+        }
+
+    def fire_initial(self, new):
+        self.run_wave(self.initial(new))
+
+    def set(self, component_id, prop, value):
+        if component_id not in self.props:
+            return
+        self.props[component_id][prop] = value
+        changed = {f"{component_id}.{prop}"}
+        self.run_wave({d["output"]: (d, changed) for d in self.triggered_by(changed)})
+
+    def burst(self, component_id, prop, values):
+        """Change a prop several times without waiting for the responses.
+
+        This is what a user scrolling through a dropdown sends: the requests
+        overlap, and all but the newest should be dropped by the server.
+        """
+        if component_id not in self.props:
+            return
+        changed = {f"{component_id}.{prop}"}
+        threads = []
+        for value in values:
+            self.props[component_id][prop] = value
+            for dep in self.triggered_by(changed):
+                thread = threading.Thread(
+                    target=self.send, args=(f"{dep['label']} (burst)", self.body(dep, changed))
+                )
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    def click(self, component_id):
+        self.set(component_id, "n_clicks", (self.value(component_id, "n_clicks") or 0) + 1)
+
+    def pick(self, component_id, k=1):
+        values = option_values(self.value(component_id, "options"))
+        return self.rng.sample(values, min(k, len(values)))
+
+    # ---------------------------------------------------------------
+    # Analyst script
+    # ---------------------------------------------------------------
+    def navigate(self, pathname):
+        self.set("url", "pathname", pathname)
+
+    def upload(self, filename, content):
+        mime = mimetypes.guess_type(filename)[0] or "text/csv"
+        self.props["upload-data"]["filename"] = filename
+        self.set("upload-data", "contents", f"data:{mime};base64,{base64.b64encode(content).decode()}")
+
+    def run_script(self, filename, content):
+        self.open()
+        self.navigate("/")
+        self.upload(filename, content)
+
+        self.navigate("/univariate")
+        for var in self.pick("uni-variable", 3):
+            self.set("uni-variable", "value", var)
+            for plot_type in ("hist", "dist", "box", "count"):
+                self.set("uni-plot-type", "value", plot_type)
+        self.set("uni-template", "value", "plotly_white")
+        self.burst("uni-variable", "value", self.pick("uni-variable", 5))
+
+        self.navigate("/bivariate")
+        for _ in range(2):
+            x, y = (self.pick("bi-x", 2) * 2)[:2]
+            self.set("bi-x", "value", x)
+            self.set("bi-y", "value", y)
+            for plot_type in ("scatter", "box", "bar"):
+                self.set("bi-plot-type", "value", plot_type)
+            self.set("bi-agg", "value", "mean")
+        self.burst("bi-x", "value", self.pick("bi-x", 5))
+
+        self.navigate("/preprocessing")
+        self.set("missing-column", "value", self.pick("missing-column", 1))
+        self.set("missing-method", "value", "mode")
+        self.click("btn-apply-missing")
+        self.set("norm-columns", "value", self.pick("norm-columns", 2))
+        self.click("btn-apply-norm")
+        self.set("enc-columns", "value", self.pick("enc-columns", 1))
+        self.set("enc-method", "value", "label")
+        self.click("btn-apply-enc")
+        self.click("btn-download-processed")
+        self.click("btn-download-recipe")
+
+
+# -------------------------------------------------------------------
+# Measurements
+# -------------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, status, seconds):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            # 204: the callback raised PreventUpdate (e.g. a superseded request)
+            if status not in (200, 204):
+                self.errors[name] += 1
+
+    def total(self):
+        return sum(len(v) for v in self.latencies.values())
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set():
+            rss = rss_bytes(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self.stop.wait(self.interval)
+
+
+def report(recorder, wall, sessions, rss):
+    print(f"{'callback':40} {'calls':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name in sorted(recorder.latencies, key=lambda n: -np.percentile(recorder.latencies[n], 95)):
+        ms = np.array(recorder.latencies[name]) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        print(f"{name:40} {len(ms):6d} {recorder.errors[name]:6d} {p50:9.1f} {p95:9.1f} {p99:9.1f}")
+    total = recorder.total()
+    print(f"\n{sessions} sessions, {total} callback requests in {wall:.1f} s "
+          f"({total / wall:.1f} req/s)")
+    if rss:
+        mb = 1024 ** 2
+        print(f"server RSS: start {rss[0] / mb:.0f} MB, peak {max(rss) / mb:.0f} MB, "
+              f"end {rss[-1] / mb:.0f} MB")
+    else:
+        print("server RSS: n/a (pass --pid or --start)")
+
+
+# -------------------------------------------------------------------
+# Runner
+# -------------------------------------------------------------------
+def start_server(url):
+    port = int(url.rsplit(":", 1)[1].split("/")[0])
+    code = (
+        "import logging; logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+        f"import app; app.app.run(debug=False, threaded=True, port={port})"
+    )
+    server = subprocess.Popen([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(240):
+        try:
+            urllib.request.urlopen(url + "/_dash-layout", timeout=2)
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit("server exited during startup")
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit("server did not come up")
+
+
+def run_session(args, deps, recorder, index, content):
+    for iteration in range(args.iterations):
+        browser = Browser(args.url, deps, recorder, seed=args.seed + index * 1000 + iteration,
+                          timeout=args.timeout)
+        browser.run_script(os.path.basename(args.csv), content)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay concurrent analyst sessions against /_dash-update-component."
+    )
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent simulated sessions")
+    parser.add_argument("--iterations", type=int, default=1, help="scripts per session")
+    parser.add_argument("--csv", default="data/raw_data.csv", help="file each session uploads")
+    parser.add_argument("--pid", type=int, help="server process to sample RSS from")
+    parser.add_argument("--start", action="store_true", help="start app.py for the run")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    args.url = args.url.rstrip("/")
+
+    server = start_server(args.url) if args.start else None
+    pid = server.pid if server else args.pid
+    try:
+        with open(args.csv, "rb") as fh:
+            content = fh.read()
+        with urllib.request.urlopen(args.url + "/_dash-dependencies", timeout=args.timeout) as resp:
+            deps = load_dependencies(json.load(resp))
+
+        recorder = Recorder()
+        sampler = RssSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [
+                pool.submit(run_session, args, deps, recorder, i, content)
+                for i in range(args.sessions)
+            ]
+            for future in as_completed(futures):
+                future.result()
+        wall = time.perf_counter() - start
+        if sampler:
+            sampler.stop.set()
+            sampler.join()
+        report(recorder, wall, args.sessions, sampler.samples if sampler else None)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+# outofcore.py
+# Chunked, on-disk dataset backend for data that does not fit in memory.
+#
+# A dataset version is a directory of Parquet part files plus a small
+# ``meta.json``.  Every aggregation is a scan over the parts and every
+# preprocessing step writes a new version directory, so memory use is bounded
+# by the chunk size rather than by the dataset size.
+import atexit
+import json
+import math
+import os
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import dates
+import preprocess
+import recipe
+from coordinator import checkpoint
+
+# -------------------------------------------------------------------
+# Settings (override with environment variables)
+# -------------------------------------------------------------------
+OOC_ROOT = os.environ.get("DASH_OOC_DIR", os.path.join(tempfile.gettempdir(), "dash-ooc"))
+CHUNK_ROWS = int(os.environ.get("DASH_OOC_CHUNK_ROWS", 250_000))
+# CSV inputs bigger than this are kept on disk instead of in a DataFrame
+OOC_THRESHOLD_BYTES = int(os.environ.get("DASH_OOC_THRESHOLD_BYTES", 256 * 1024 ** 2))
+# rows drawn for plots that need raw points (scatter, box, violin)
+PLOT_SAMPLE_ROWS = 20_000
+# resolution of the histogram used for approximate quantiles
+QUANTILE_BINS = 4096
+# distinct values tracked by value_counts; beyond this only the most frequent
+# are kept (approximately counted) and label encoding is refused
+DISTINCT_LIMIT = int(os.environ.get("DASH_OOC_DISTINCT_LIMIT", 100_000))
+# values shown by value_counts(top=...) before the rest are summed into one row
+TOP_VALUES = 50
+
+META_FILE = "meta.json"
+
+# each server process writes below its own directory, removed again at exit
+PROCESS_ROOT = os.path.join(OOC_ROOT, f"proc-{os.getpid()}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clean_stale_roots():
+    """Remove the directories of server processes that are gone (and our own leftovers)."""
+    if not os.path.isdir(OOC_ROOT):
+        return
+    for name in os.listdir(OOC_ROOT):
+        if not name.startswith("proc-") or not name[5:].isdigit():
+            continue
+        pid = int(name[5:])
+        # a directory with our pid is from an earlier process that had the same pid
+        if pid == os.getpid() or not _pid_alive(pid):
+            shutil.rmtree(os.path.join(OOC_ROOT, name), ignore_errors=True)
+
+
+clean_stale_roots()
+atexit.register(shutil.rmtree, PROCESS_ROOT, ignore_errors=True)
+
+
+def _unify_dtype(a, b):
+    if a == b:
+        return a
+    if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+        return "float64"
+    return "object"
+
+
+class ChunkedDataset:
+    """A read-only dataset version stored as Parquet parts on local disk."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as fh:
+            meta = json.load(fh)
+        self.columns = pd.Index(meta["columns"])
+        self._dtypes = meta["dtypes"]
+        self.parts = meta["parts"]
+        self.n_rows = meta["n_rows"]
+
+    # ---------------------------------------------------------------
+    # Construction
+    # ---------------------------------------------------------------
+    @classmethod
+    def from_frames(cls, frames, root=None):
+        path = os.path.join(root or PROCESS_ROOT, uuid.uuid4().hex)
+        os.makedirs(path)
+        columns, dtypes, parts, n_rows = None, {}, [], 0
+        try:
+            for frame in frames:
+                if columns is None:
+                    columns = [str(c) for c in frame.columns]
+                frame.columns = [str(c) for c in frame.columns]
+                for col in frame.columns:
+                    seen = str(frame[col].dtype)
+                    dtypes[col] = _unify_dtype(dtypes[col], seen) if col in dtypes else seen
+                name = f"part-{len(parts):05d}.parquet"
+                frame.reset_index(drop=True).to_parquet(os.path.join(path, name), index=False)
+                parts.append(name)
+                n_rows += len(frame)
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+        meta = {
+            "columns": columns or [],
+            "dtypes": dtypes,
+            "parts": parts,
+            "n_rows": n_rows,
+        }
+        with open(os.path.join(path, META_FILE), "w") as fh:
+            json.dump(meta, fh)
+        return cls(path)
+
+    @classmethod
+    def from_csv(cls, source, chunksize=CHUNK_ROWS, root=None, **read_kwargs):
+        reader = pd.read_csv(source, chunksize=chunksize, **read_kwargs)
+        return cls.from_frames(dates.parse_date_stream(reader), root=root)
+
+    # ---------------------------------------------------------------
+    # Metadata
+    # ---------------------------------------------------------------
+    @property
+    def shape(self):
+        return (self.n_rows, len(self.columns))
+
+    @property
+    def dtypes(self):
+        return pd.Series([self._dtypes[c] for c in self.columns], index=self.columns)
+
+    def is_numeric(self, col):
+        return pd.api.types.is_numeric_dtype(self._dtypes[col]) and self._dtypes[col] != "bool"
+
+    def numeric_columns(self):
+        return [c for c in self.columns if self.is_numeric(c)]
+
+    def object_columns(self):
+        return [c for c in self.columns if self._dtypes[c] == "object"]
+
+    # ---------------------------------------------------------------
+    # Scanning
+    # ---------------------------------------------------------------
+    def iter_chunks(self, columns=None):
+        for name in self.parts:
+            # lets the callback coordinator cancel scans nobody is waiting for
+            checkpoint()
+            chunk = pd.read_parquet(os.path.join(self.path, name), columns=columns)
+            for col in chunk.columns:
+                want = self._dtypes[col]
+                if str(chunk[col].dtype) != want and want in ("float64", "object"):
+                    chunk[col] = chunk[col].astype(want)
+            yield chunk
+
+    def map_chunks(self, func):
+        """Write ``func(chunk)`` for every chunk as a new dataset version."""
+        return ChunkedDataset.from_frames(
+            (func(chunk) for chunk in self.iter_chunks()),
+            root=os.path.dirname(self.path),
+        )
+
+    def head(self, n=5):
+        for chunk in self.iter_chunks():
+            return chunk.head(n)
+        return pd.DataFrame(columns=self.columns)
+
+    def sample(self, n=PLOT_SAMPLE_ROWS, columns=None, random_state=42):
+        if self.n_rows <= n:
+            return pd.concat(list(self.iter_chunks(columns)), ignore_index=True)
+        frac = n / self.n_rows
+        rng = np.random.default_rng(random_state)
+        picked = [
+            chunk[rng.random(len(chunk)) < frac] for chunk in self.iter_chunks(columns)
+        ]
+        return pd.concat(picked, ignore_index=True)
+
+    # ---------------------------------------------------------------
+    # Aggregations
+    # ---------------------------------------------------------------
+    def missing_counts(self):
+        total = pd.Series(0, index=self.columns, dtype="int64")
+        for chunk in self.iter_chunks():
+            total = total.add(chunk.isna().sum(), fill_value=0)
+        return total.astype("int64")
+
+    def moments(self, columns):
+        """count / mean / m2 (sum of squared deviations) / min / max for numeric columns.
+
+        Each chunk's mean and m2 are merged with Chan's pairwise update, so the
+        variance stays exact on large-magnitude columns.
+        """
+        stats = pd.DataFrame(
+            {"count": 0.0, "mean": 0.0, "m2": 0.0, "min": np.inf, "max": -np.inf},
+            index=pd.Index(columns),
+        )
+        for chunk in self.iter_chunks(list(columns)):
+            block = chunk.astype("float64")
+            n_b = block.count()
+            mean_b = block.mean().fillna(0.0)
+            m2_b = ((block - mean_b) ** 2).sum()
+            n_a = stats["count"]
+            n = n_a + n_b
+            share = (n_b / n).fillna(0.0)
+            delta = mean_b - stats["mean"]
+            stats["mean"] += delta * share
+            stats["m2"] += m2_b + delta ** 2 * n_a * share
+            stats["count"] = n
+            stats["min"] = np.fmin(stats["min"], block.min())
+            stats["max"] = np.fmax(stats["max"], block.max())
+        stats.loc[stats["count"] == 0, ["mean", "min", "max"]] = np.nan
+        return stats
+
+    def min_max(self, columns):
+        stats = self.moments(columns)
+        return stats["min"], stats["max"]
+
+    def histogram(self, col, nbins=30, value_range=None):
+        if value_range is None:
+            lo, hi = self.min_max([col])
+            value_range = (lo[col], hi[col])
+        lo, hi = value_range
+        if pd.isna(lo):
+            return np.array([]), np.array([0.0, 1.0])
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        edges = np.linspace(lo, hi, nbins + 1)
+        counts = np.zeros(nbins, dtype="int64")
+        for chunk in self.iter_chunks([col]):
+            values = chunk[col].dropna().to_numpy(dtype="float64")
+            counts += np.histogram(values, bins=edges)[0]
+        return counts, edges
+
+    def quantiles(self, col, qs=(0.25, 0.5, 0.75), stats=None):
+        """Approximate quantiles interpolated from a fine histogram."""
+        if stats is None:
+            stats = self.moments([col]).loc[col]
+        if not stats["count"]:
+            return [np.nan for _ in qs]
+        counts, edges = self.histogram(col, QUANTILE_BINS, (stats["min"], stats["max"]))
+        cum = np.concatenate([[0], np.cumsum(counts)]) / counts.sum()
+        return [float(np.interp(q, cum, edges)) for q in qs]
+
+    def describe(self, col):
+        stats = self.moments([col]).loc[col]
+        n = stats["count"]
+        std = math.sqrt(stats["m2"] / (n - 1)) if n > 1 else np.nan
+        q1, q2, q3 = self.quantiles(col, stats=stats)
+        return pd.Series(
+            [n, stats["mean"], std,
+             stats["min"], q1, q2, q3, stats["max"]],
+            index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"],
+            name=col,
+        )
+
+    def value_counts(self, col, top=None):
+        """Counts of the distinct values of ``col``, most frequent first.
+
+        At most DISTINCT_LIMIT values are tracked: past that, the least frequent
+        are dropped after each chunk, so only the top of the result is reliable
+        and ``attrs["distinct"]`` is None instead of the number of values.  With
+        ``top``, the values after the first ``top`` are summed into a single
+        "Other" row.
+        """
+        total = pd.Series(dtype="int64")
+        present = 0
+        capped = False
+        for chunk in self.iter_chunks([col]):
+            values = chunk[col]
+            present += int(values.notna().sum())
+            total = total.add(values.value_counts(), fill_value=0)
+            if len(total) > DISTINCT_LIMIT:
+                total = total.nlargest(DISTINCT_LIMIT)
+                capped = True
+        total = total.astype("int64").sort_values(ascending=False)
+        distinct = None if capped else len(total)
+        if top is not None and (capped or len(total) > top):
+            shown = total.head(top)
+            others = "more than {:,}".format(DISTINCT_LIMIT) if capped else f"{len(total) - top:,}"
+            other = pd.Series({f"Other ({others} values)": present - int(shown.sum())})
+            # a numeric column's values become labels next to the "Other" row
+            shown.index = shown.index.astype(str)
+            total = pd.concat([shown, other])
+        total.index.name = col
+        total = total.rename("count")
+        total.attrs["distinct"] = distinct
+        return total
+
+    def mode(self, col):
+        vc = self.value_counts(col)
+        return vc.index[0] if len(vc) else np.nan
+
+    def corr(self, x, y):
+        # Pearson correlation over the pairwise-complete rows; the co-moments
+        # of each chunk are merged like the moments above
+        n = mx = my = cxx = cyy = cxy = 0.0
+        for chunk in self.iter_chunks([x, y]):
+            pair = chunk[[x, y]].astype("float64").dropna()
+            if pair.empty:
+                continue
+            a, b = pair[x].to_numpy(), pair[y].to_numpy()
+            n_b, ma, mb = len(pair), a.mean(), b.mean()
+            da, db = a - ma, b - mb
+            total = n + n_b
+            dx, dy = ma - mx, mb - my
+            weight = n * n_b / total
+            cxx += (da * da).sum() + dx * dx * weight
+            cyy += (db * db).sum() + dy * dy * weight
+            cxy += (da * db).sum() + dx * dy * weight
+            mx += dx * n_b / total
+            my += dy * n_b / total
+            n = total
+        if n < 2:
+            return np.nan
+        den = math.sqrt(cxx * cyy)
+        return cxy / den if den else np.nan
+
+    # ---------------------------------------------------------------
+    # Preprocessing (fit with chunked scans, apply per chunk as a new version)
+    # ---------------------------------------------------------------
+    def apply_step(self, step):
+        """Apply a fitted recipe step chunk by chunk."""
+        if step["step"] == "astype" and step["newtype"] == "category":
+            # per-chunk categoricals would not share codes; keep the values as strings
+            step = dict(step, newtype="string")
+        return self.map_chunks(lambda chunk: recipe.apply_step(chunk, step))
+
+    def fit_fill_values(self, columns, method, constant=None):
+        if method == "constant":
+            return preprocess.constant_fill_values(self.dtypes, columns, constant)
+        if method == "mean":
+            return self.moments(columns)["mean"].to_dict()
+        if method == "median":
+            return {col: self.quantiles(col, (0.5,))[0] for col in columns}
+        return {col: self.mode(col) for col in columns}
+
+    def fit_bin_edges(self, col, bins):
+        lo, hi = self.min_max([col])
+        lo, hi = lo[col], hi[col]
+        # same edges pd.cut(..., include_lowest=True) would use on the full column
+        if lo == hi:
+            pad = 0.001 * abs(lo) if lo != 0 else 0.001
+            edges = np.linspace(lo - pad, hi + pad, bins + 1)
+        else:
+            edges = np.linspace(lo, hi, bins + 1)
+            edges[0] -= (hi - lo) * 0.001
+        return edges.tolist()
+
+    def fit_scaling(self, columns, method="minmax"):
+        stats = self.moments(columns)
+        if method == "zscore":
+            center = stats["mean"]
+            scale = np.sqrt(stats["m2"] / (stats["count"] - 1))
+        elif method == "robust":
+            q = {col: self.quantiles(col, stats=stats.loc[col]) for col in columns}
+            center = pd.Series({col: q[col][1] for col in columns})
+            scale = pd.Series({col: q[col][2] - q[col][0] for col in columns})
+        else:  # minmax
+            center, scale = stats["min"], stats["max"] - stats["min"]
+        return preprocess.scaling_params(columns, center, scale)
+
+    def fit_label_encoding(self, columns):
+        # codes must agree across chunks, so collect the sorted categories first
+        categories = {}
+        for col in columns:
+            vc = self.value_counts(col)
+            if vc.attrs["distinct"] is None:
+                raise ValueError(f"{col} has more than {DISTINCT_LIMIT:,} distinct values")
+            categories[col] = preprocess.sorted_categories(vc.index)
+        return categories
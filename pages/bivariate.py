@@ -1,12 +1,17 @@
 # pages/bivariate.py
 from dash import html, dcc
 
+from cube import CUBE_AGGREGATES
+from figures import DEFAULT_HEIGHT, DEFAULT_TEMPLATE, FIGURE_TEMPLATES, HEIGHTS
+from pages.sampling_bar import layout as sampling_bar
+
 def layout():
     return html.Div(
         className="container",
         style={"padding": "40px 10px"},
         children=[
             html.H2("Bivariate Analysis"),
+            sampling_bar(),
             html.Div(
                 style={"display": "flex", "gap": "20px"},
                 children=[
@@ -30,6 +35,35 @@ def layout():
                                 ],
                                 value="scatter",
                             ),
+                            html.Br(),
+                            html.Label("Bar Aggregate (categorical X)"),
+                            dcc.Dropdown(
+                                id="bi-agg",
+                                options=[
+                                    {"label": label, "value": value}
+                                    for value, label in CUBE_AGGREGATES.items()
+                                ],
+                                value="sum",
+                                clearable=False,
+                            ),
+                            html.Br(),
+                            html.Label("Chart Style"),
+                            dcc.Dropdown(
+                                id="bi-template",
+                                options=[{"label": t, "value": t} for t in FIGURE_TEMPLATES],
+                                value=DEFAULT_TEMPLATE,
+                                clearable=False,
+                            ),
+                            html.Br(),
+                            html.Label("Chart Height"),
+                            dcc.Dropdown(
+                                id="bi-height",
+                                options=[{"label": f"{h} px", "value": h} for h in HEIGHTS],
+                                value=DEFAULT_HEIGHT,
+                                clearable=False,
+                            ),
+                            # what the graph currently shows, so related views can be patched
+                            dcc.Store(id="bi-view"),
                         ],
                     ),
                     html.Div(
@@ -38,7 +72,7 @@ def layout():
                             html.H4("Correlation / Interpretation"),
                             html.Div(id="bi-summary"),
                             html.Br(),
-                            dcc.Graph(id="bi-graph",style={"height": "500px"},clear_on_unhover=True),
+                            dcc.Graph(id="bi-graph",clear_on_unhover=True),
                         ],
                     ),
                 ],
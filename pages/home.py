@@ -17,6 +17,7 @@ def layout():
                     html.Li("Upload CSV datasets or use the default ecommerce data."),
                     html.Li("View univariate distributions and summaries."),
                     html.Li("Explore relationships between two variables."),
+                    html.Li("Follow orders and returns per day, week or month."),
                     html.Li("Run a step-by-step preprocessing pipeline and download the result."),
                 ]
             ),
@@ -25,7 +26,7 @@ def layout():
             dcc.Upload(
                 id="upload-data",
                 children=html.Div(
-                    "Drag and Drop or Select a CSV File",
+                    "Drag and Drop or Select a CSV File (.csv, .csv.gz or .csv.zst)",
                     style={
                         "padding": "40px",
                         "border": "2px dashed #999",
@@ -35,7 +36,23 @@ def layout():
                 multiple=False,
             ),
             html.Br(),
+            html.Label("Large files (streamed to the server, read in chunks if they do not fit in memory)"),
+            html.Div(
+                style={"display": "flex", "gap": "10px", "alignItems": "center"},
+                children=[
+                    # dash.html has no <input>; the fetch in app.py reads the file from it
+                    dcc.Markdown(
+                        '<input type="file" id="upload-large-file" accept=".csv,.gz,.zst">',
+                        dangerously_allow_html=True,
+                    ),
+                    html.Button("Upload", id="btn-upload-large", n_clicks=0),
+                ],
+            ),
+            # response of POST /upload: {"handle", "message"} or {"error"}
+            dcc.Store(id="streamed-upload"),
+            html.Br(),
             html.Div(id="upload-status"),
+            html.Div(id="session-memory", style={"color": "#666"}),
             html.Br(),
             html.P(
                 "If no file is uploaded, the dashboard uses our default ecommerce dataset."
@@ -1,6 +1,8 @@
 # pages/preprocessing.py
 from dash import html, dcc, dash_table
 
+from preprocess import SCALING_METHODS
+
 def layout():
     return html.Div(
         className="container",
@@ -31,8 +33,8 @@ def layout():
                                 children=[
                                     html.Div(
                                         [
-                                            html.Label("Select Column"),
-                                            dcc.Dropdown(id="missing-column"),
+                                            html.Label("Select Columns"),
+                                            dcc.Dropdown(id="missing-column", multi=True),
                                         ],
                                         style={"width": "30%"},
                                     ),
@@ -175,13 +177,24 @@ def layout():
                         value="tab-normalization",
                         children=[
                             html.Br(),
-                            html.H4("Normalize Numeric Columns (Min-Max)"),
+                            html.H4("Normalize Numeric Columns"),
                             html.Label("Select Columns"),
                             dcc.Dropdown(
                                 id="norm-columns",
                                 multi=True,
                             ),
                             html.Br(),
+                            html.Label("Scaling Method"),
+                            dcc.Dropdown(
+                                id="norm-method",
+                                options=[
+                                    {"label": label, "value": value}
+                                    for value, label in SCALING_METHODS.items()
+                                ],
+                                value="minmax",
+                                clearable=False,
+                            ),
+                            html.Br(),
                             html.Button(
                                 "Apply Normalization",
                                 id="btn-apply-norm",
@@ -261,5 +274,22 @@ def layout():
                 className="btn btn-success",
             ),
             dcc.Download(id="download-processed"),
+            # large (on-disk) datasets are downloaded from a streamed route
+            dcc.Location(id="download-location", refresh=True),
+            html.Button(
+                "Download Preprocessing Recipe",
+                id="btn-download-recipe",
+                className="btn btn-outline-success",
+                style={"marginLeft": "10px"},
+            ),
+            dcc.Download(id="download-recipe"),
+            html.Br(),
+            html.Br(),
+            html.H5("Fitted Recipe"),
+            html.P(
+                "Replay it on new CSV files with: "
+                "python batch.py preprocessing_recipe.json data/*.csv --out-dir prepared"
+            ),
+            html.Div(id="recipe-steps"),
         ],
     )
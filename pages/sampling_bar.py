@@ -0,0 +1,30 @@
+# pages/sampling_bar.py
+# Sample / full-data switch shown above the univariate and bivariate views.
+from dash import html, dcc
+import dash_bootstrap_components as dbc
+
+from sampling import SAMPLING_MODES
+
+def layout():
+    return html.Div(
+        style={"display": "flex", "gap": "15px", "alignItems": "center", "paddingBottom": "15px"},
+        children=[
+            dcc.RadioItems(
+                id="sampling-mode",
+                options=[{"label": label, "value": value} for value, label in SAMPLING_MODES.items()],
+                value="reservoir",
+                inline=True,
+                inputStyle={"marginRight": "4px", "marginLeft": "10px"},
+                # the choice carries over between the two pages
+                persistence=True,
+                persistence_type="session",
+            ),
+            dcc.Dropdown(
+                id="sampling-strata",
+                placeholder="Stratify by",
+                clearable=False,
+                style={"width": "220px"},
+            ),
+            dbc.Badge(id="sampling-badge", color="secondary"),
+        ],
+    )
@@ -0,0 +1,49 @@
+# pages/timeseries.py
+from dash import html, dcc
+
+from rollups import FREQUENCIES
+
+def layout():
+    return html.Div(
+        className="container",
+        style={"padding": "40px 10px"},
+        children=[
+            html.H2("Time Series"),
+            html.Div(
+                style={"display": "flex", "gap": "20px"},
+                children=[
+                    html.Div(
+                        style={"width": "25%"},
+                        children=[
+                            html.Label("Date Columns"),
+                            dcc.Dropdown(
+                                id="ts-columns",
+                                multi=True,
+                                placeholder="Select date columns",
+                            ),
+                            html.Br(),
+                            html.Label("Granularity"),
+                            dcc.RadioItems(
+                                id="ts-freq",
+                                options=[
+                                    {"label": label, "value": value}
+                                    for value, label in FREQUENCIES.items()
+                                ],
+                                value="W",
+                                labelStyle={"display": "block"},
+                            ),
+                        ],
+                    ),
+                    html.Div(
+                        style={"width": "70%"},
+                        children=[
+                            html.H4("Rows per Period"),
+                            html.Div(id="ts-summary"),
+                            html.Br(),
+                            dcc.Graph(id="ts-graph", style={"height": "500px"}),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
@@ -1,12 +1,16 @@
 # pages/univariate.py
 from dash import html, dcc
 
+from figures import DEFAULT_HEIGHT, DEFAULT_TEMPLATE, FIGURE_TEMPLATES, HEIGHTS
+from pages.sampling_bar import layout as sampling_bar
+
 def layout():
     return html.Div(
         className="container",
         style={"padding": "40px 10px"},
         children=[
             html.H2("Univariate Analysis"),
+            sampling_bar(),
             html.Div(
                 style={"display": "flex", "gap": "20px"},
                 children=[
@@ -31,6 +35,24 @@ def layout():
                                 ],
                                 value="hist",
                             ),
+                            html.Br(),
+                            html.Label("Chart Style"),
+                            dcc.Dropdown(
+                                id="uni-template",
+                                options=[{"label": t, "value": t} for t in FIGURE_TEMPLATES],
+                                value=DEFAULT_TEMPLATE,
+                                clearable=False,
+                            ),
+                            html.Br(),
+                            html.Label("Chart Height"),
+                            dcc.Dropdown(
+                                id="uni-height",
+                                options=[{"label": f"{h} px", "value": h} for h in HEIGHTS],
+                                value=DEFAULT_HEIGHT,
+                                clearable=False,
+                            ),
+                            # what the graph currently shows, so related views can be patched
+                            dcc.Store(id="uni-view"),
                         ],
                     ),
                     html.Div(
@@ -39,7 +61,7 @@ def layout():
                             html.H4("Statistical Summary"),
                             html.Div(id="uni-summary"),
                             html.Br(),
-                            dcc.Graph(id="uni-graph",style={"height": "500px"},clear_on_unhover=True),
+                            dcc.Graph(id="uni-graph",clear_on_unhover=True),
                         ],
                     ),
                 ],
@@ -0,0 +1,199 @@
+# preprocess.py
+# Multi-column preprocessing steps shared by the in-memory and chunked backends.
+#
+# Every step is split into a ``fit_*`` function that computes the statistics
+# for all selected columns in one vectorized pass over the column block, and
+# a transform that applies the fitted parameters.  Transforms split the
+# selected columns into one group per worker and run the groups on a thread
+# pool; the numpy kernels they call release the GIL, so wide selections use
+# all cores.
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import dates
+
+PREPROCESS_WORKERS = int(os.environ.get("DASH_PREPROCESS_WORKERS", os.cpu_count() or 1))
+
+SCALING_METHODS = {
+    "minmax": "Min-Max",
+    "zscore": "Z-score (standard)",
+    "robust": "Robust (median / IQR)",
+}
+
+
+def column_groups(columns):
+    """Split ``columns`` into one contiguous group per worker."""
+    columns = list(columns)
+    if not columns:
+        return []
+    n = max(1, min(len(columns), PREPROCESS_WORKERS))
+    size = math.ceil(len(columns) / n)
+    return [columns[i:i + size] for i in range(0, len(columns), size)]
+
+
+def in_groups(columns, func):
+    """Run ``func(group)`` for every column group on the thread pool."""
+    groups = column_groups(columns)
+    if len(groups) <= 1:
+        return [func(group) for group in groups]
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        return list(pool.map(func, groups))
+
+
+def map_blocks(df, columns, func):
+    """Replace ``columns`` with ``func(block)``, one 2-D block per thread."""
+    if not len(columns):
+        return df
+    blocks = in_groups(columns, lambda group: func(df[group]))
+    df = df.copy(deep=False)
+    for block in blocks:
+        for col in block.columns:
+            df[col] = block[col]
+    return df
+
+
+# -------------------------------------------------------------------
+# Missing values
+# -------------------------------------------------------------------
+def constant_fill_values(dtypes, columns, constant):
+    """The constant (typed in as text) converted to each column's type.
+
+    Raises ``ValueError`` when it is not a number but a column is numeric.
+    """
+    values = {}
+    for col in columns:
+        dtype = dtypes[col]
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            values[col] = pd.to_numeric(constant).item()
+        else:
+            values[col] = constant
+    return values
+
+
+def fit_fill_values(df, columns, method, constant=None):
+    if method == "constant":
+        return constant_fill_values(df.dtypes, columns, constant)
+    block = df[list(columns)]
+    if method == "mode":
+        modes = block.mode(dropna=True)
+        return {col: modes[col].iloc[0] if len(modes) else np.nan for col in columns}
+    # mean / median reduce the whole 2-D block at once
+    return getattr(block, method)().to_dict()
+
+
+def fill_missing(df, fill_values):
+    # a NaN fill value (e.g. the mean of an all-missing column) is a no-op
+    fill_values = {c: v for c, v in fill_values.items() if v is not None and not pd.isna(v)}
+    return map_blocks(df, fill_values, lambda block: block.fillna(fill_values))
+
+
+def drop_missing(df, columns):
+    return df[df[list(columns)].notna().all(axis=1)]
+
+
+# -------------------------------------------------------------------
+# Data types and discretization
+# -------------------------------------------------------------------
+def convert_dtype(df, column, newtype, date_format=None):
+    df = df.copy(deep=False)
+    if newtype == "int":
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+    elif newtype == "float":
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    elif newtype == "category":
+        df[column] = df[column].astype("category")
+    elif newtype == "datetime":
+        df[column] = dates.to_datetime(df[column], date_format)
+    else:  # string
+        df[column] = df[column].astype(str)
+    return df
+
+
+def fit_bin_edges(df, column, bins):
+    _, edges = pd.cut(df[column], bins=bins, retbins=True, include_lowest=True)
+    return edges.tolist()
+
+
+def apply_bins(df, column, edges, new_column):
+    df = df.copy(deep=False)
+    df[new_column] = pd.cut(df[column], bins=edges, labels=False, include_lowest=True)
+    return df
+
+
+# -------------------------------------------------------------------
+# Scaling
+# -------------------------------------------------------------------
+def fit_scaling(df, columns, method="minmax"):
+    """Return ``{column: (center, scale)}``; constant columns are left out."""
+    block = df[list(columns)]
+    if method == "zscore":
+        center, scale = block.mean(), block.std()
+    elif method == "robust":
+        q = block.quantile([0.25, 0.5, 0.75])
+        center, scale = q.loc[0.5], q.loc[0.75] - q.loc[0.25]
+    else:  # minmax
+        center = block.min()
+        scale = block.max() - center
+    return scaling_params(columns, center, scale)
+
+
+def scaling_params(columns, center, scale):
+    return {
+        col: (float(center[col]), float(scale[col]))
+        for col in columns
+        if pd.notna(scale[col]) and scale[col] != 0
+    }
+
+
+def scale_columns(df, params):
+    center = pd.Series({col: c for col, (c, _) in params.items()}, dtype="float64")
+    scale = pd.Series({col: k for col, (_, k) in params.items()}, dtype="float64")
+    return map_blocks(
+        df, params, lambda block: (block - center[block.columns]) / scale[block.columns]
+    )
+
+
+# -------------------------------------------------------------------
+# Label encoding
+# -------------------------------------------------------------------
+def fit_label_encoding(df, columns):
+    """Sorted categories per column (same codes as ``astype("category")``)."""
+    categories = {}
+    for part in in_groups(columns, lambda group: {c: _sorted_uniques(df[c]) for c in group}):
+        categories.update(part)
+    return {col: categories[col] for col in columns}
+
+
+def _sorted_uniques(series):
+    return sorted_categories(series.dropna().unique())
+
+
+def sorted_categories(values):
+    """``values`` sorted; in the given order if they do not compare (mixed types), as ``pd.Categorical`` does."""
+    index = pd.Index(values)
+    try:
+        return index.sort_values().tolist()
+    except TypeError:
+        return index.tolist()
+
+
+def label_encode(df, categories):
+    def encode(block):
+        return pd.DataFrame(
+            {c: pd.Categorical(block[c], categories=categories[c]).codes for c in block.columns},
+            index=block.index,
+        )
+
+    return map_blocks(df, categories, encode)
+
+
+def onehot_encode(df, categories, drop_first=True):
+    # fixed categories keep the dummy columns identical across files and chunks
+    df = df.copy(deep=False)
+    for col, cats in categories.items():
+        df[col] = pd.Categorical(df[col], categories=cats)
+    return pd.get_dummies(df, columns=list(categories), drop_first=drop_first)
@@ -0,0 +1,111 @@
+# recipe.py
+# Serializable record of the fitted preprocessing steps.
+#
+# Each preprocessing callback appends one step holding the parameters it
+# fitted (fill values, scaling center/scale, bin edges, category lists).
+# ``apply_step`` only uses those parameters and never looks at the rest of
+# the data, so a recipe can be replayed chunk by chunk on new files with the
+# same result as in the dashboard (see ``batch.py``).
+import json
+
+import numpy as np
+import pandas as pd
+
+import preprocess
+
+RECIPE_VERSION = 1
+
+
+def plain(value):
+    """Turn numpy / pandas scalars into JSON-friendly Python values."""
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [plain(v) for v in value]
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def make_step(step, **params):
+    return {"step": step, **plain(params)}
+
+
+# -------------------------------------------------------------------
+# Applying steps
+# -------------------------------------------------------------------
+def apply_step(df, step):
+    kind = step["step"]
+    if kind == "drop_missing":
+        return preprocess.drop_missing(df, step["columns"])
+    if kind == "fill_missing":
+        return preprocess.fill_missing(df, step["values"])
+    if kind == "astype":
+        return preprocess.convert_dtype(df, step["column"], step["newtype"], step.get("date_format"))
+    if kind == "discretize":
+        return preprocess.apply_bins(df, step["column"], step["edges"], step["new_column"])
+    if kind == "scale":
+        return preprocess.scale_columns(df, step["params"])
+    if kind == "label_encode":
+        return preprocess.label_encode(df, step["categories"])
+    if kind == "onehot":
+        return preprocess.onehot_encode(df, step["categories"], step["drop_first"])
+    raise ValueError(f"Unknown recipe step: {kind!r}")
+
+
+def apply_recipe(df, steps):
+    for step in steps:
+        df = apply_step(df, step)
+    return df
+
+
+def touched_columns(step):
+    """Columns a step rewrites or adds; None if it can change the set of rows."""
+    kind = step["step"]
+    if kind == "drop_missing":
+        return None
+    if kind == "fill_missing":
+        return set(step["values"])
+    if kind == "astype":
+        return {step["column"]}
+    if kind == "discretize":
+        return {step["new_column"]}
+    if kind == "scale":
+        return set(step["params"])
+    return set(step["categories"])
+
+
+def describe_step(step):
+    kind = step["step"]
+    if kind == "drop_missing":
+        return f"Drop rows missing {', '.join(step['columns'])}"
+    if kind == "fill_missing":
+        return f"Fill missing ({step['method']}): {', '.join(step['values'])}"
+    if kind == "astype":
+        return f"Convert {step['column']} to {step['newtype']}"
+    if kind == "discretize":
+        return f"Discretize {step['column']} into {len(step['edges']) - 1} bins"
+    if kind == "scale":
+        return f"{preprocess.SCALING_METHODS[step['method']]} scaling: {', '.join(step['params'])}"
+    if kind == "label_encode":
+        return f"Label encoding: {', '.join(step['categories'])}"
+    return f"One-hot encoding: {', '.join(step['categories'])}"
+
+
+# -------------------------------------------------------------------
+# Serialization
+# -------------------------------------------------------------------
+def dumps(steps):
+    return json.dumps({"version": RECIPE_VERSION, "steps": steps}, indent=2)
+
+
+def load(path):
+    with open(path) as fh:
+        payload = json.load(fh)
+    if payload.get("version") != RECIPE_VERSION:
+        raise ValueError(f"Unsupported recipe version: {payload.get('version')!r}")
+    return payload["steps"]
@@ -0,0 +1,50 @@
+# rollups.py
+# Pre-aggregated time-series rollups for date columns (orders / returns per period).
+#
+# The base rollup is a per-day row count for one date column, built once per
+# dataset version (chunk by chunk for on-disk datasets) and cached in the
+# registry.  Weekly and monthly views are re-sampled from it.
+import pandas as pd
+
+from datasets import registry
+from outofcore import ChunkedDataset
+
+FREQUENCIES = {
+    "D": "Day",
+    "W": "Week",
+    "MS": "Month",
+}
+
+
+def date_columns(ds):
+    return [c for c, dtype in ds.dtypes.items() if str(dtype).startswith("datetime64")]
+
+
+def _count_days(series):
+    return series.dropna().dt.normalize().value_counts()
+
+
+def build_daily_counts(ds, col):
+    if isinstance(ds, ChunkedDataset):
+        total = pd.Series(dtype="int64")
+        for chunk in ds.iter_chunks([col]):
+            total = total.add(_count_days(chunk[col]), fill_value=0)
+    else:
+        total = _count_days(ds[col])
+    total = total.astype("int64").sort_index()
+    total.index = pd.DatetimeIndex(total.index, name=col)
+    return total.rename("count")
+
+
+def daily_counts(handle, col):
+    return registry.cached(
+        handle, ("daily_counts", col), lambda: build_daily_counts(registry.resolve(handle), col)
+    )
+
+
+def rollup(handle, col, freq="D"):
+    """Row counts of ``col`` per day / week / month, with empty periods as 0."""
+    daily = daily_counts(handle, col)
+    if daily.empty:
+        return daily
+    return daily.resample(freq).sum()
@@ -0,0 +1,191 @@
+# sampling.py
+# Dataset-level samples for the exploratory (univariate / bivariate) views.
+#
+# A sample is drawn once per dataset version and registered as a dataset of its
+# own, so the EDA callbacks, aggregates and cube run on it unchanged and their
+# results are cached per sample.  Every row gets a uniform random key in one
+# streaming pass over the data and the rows with the smallest keys are kept:
+#
+# * reservoir  - the ``n`` smallest keys overall (a simple random sample);
+# * stratified - per value of a categorical column, the smallest keys in
+#   proportion to that value's share of the rows (so estimates need no weights).
+#
+# The views show 95% confidence intervals for the sampled statistics.
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from datasets import registry
+from outofcore import CHUNK_ROWS, ChunkedDataset
+
+SAMPLE_ROWS = int(os.environ.get("DASH_SAMPLE_ROWS", 50_000))
+SAMPLE_SEED = 42
+SAMPLING_MODES = {
+    "reservoir": "Sample",
+    "stratified": "Stratified sample",
+    "full": "Full data",
+}
+CONFIDENCE_Z = 1.96
+
+KEY = "__sample_key"
+STRATUM = "__sample_stratum"
+
+
+# -------------------------------------------------------------------
+# Drawing
+# -------------------------------------------------------------------
+def _chunks(ds):
+    if isinstance(ds, ChunkedDataset):
+        yield from ds.iter_chunks()
+    else:
+        for start in range(0, len(ds), CHUNK_ROWS):
+            yield ds.iloc[start:start + CHUNK_ROWS]
+
+
+def _smallest(frame, n, strata):
+    if strata is None:
+        return frame.nsmallest(n, KEY)
+    frame = frame.sort_values(KEY, kind="stable")
+    return frame[frame.groupby(STRATUM, sort=False).cumcount() < n]
+
+
+def draw(ds, n=SAMPLE_ROWS, strata=None, seed=SAMPLE_SEED):
+    """Uniform random sample of ``n`` rows, stratified on ``strata`` if given."""
+    rng = np.random.default_rng(seed)
+    kept, sizes = None, pd.Series(dtype="int64")
+    for chunk in _chunks(ds):
+        chunk = chunk.assign(**{KEY: rng.random(len(chunk))})
+        if strata is not None:
+            chunk[STRATUM] = chunk[strata].astype(object).fillna("(missing)").astype(str)
+            sizes = sizes.add(chunk[STRATUM].value_counts(), fill_value=0)
+        kept = chunk if kept is None else pd.concat([kept, chunk])
+        # every stratum keeps up to n candidates until the sizes are known
+        kept = _smallest(kept, n, strata)
+
+    if strata is not None:
+        quota = (sizes / sizes.sum() * n).round().clip(lower=1).astype("int64")
+        kept = kept[kept.groupby(STRATUM, sort=False).cumcount() < kept[STRATUM].map(quota)]
+        kept = kept.drop(columns=STRATUM)
+    return kept.sort_values(KEY, kind="stable").drop(columns=KEY).reset_index(drop=True)
+
+
+def sample_view(handle, mode="reservoir", strata=None):
+    """Handle for the EDA views: the sample of ``handle``, or ``handle`` itself.
+
+    A sample handle carries ``"sample": {"rows", "population", "mode", "strata"}``.
+    """
+    if mode == "full" or not isinstance(handle, dict):
+        return handle
+    if mode != "stratified":
+        strata = None
+
+    def build():
+        ds = registry.resolve(handle)
+        population = ds.shape[0]
+        if population <= SAMPLE_ROWS:
+            return handle
+        if strata is not None and strata not in ds.columns:
+            return handle
+        sample = draw(ds, SAMPLE_ROWS, strata)
+        # charged to the same session, so it expires with the version it was drawn from
+        view = registry.add(sample, name=f"sample of {handle['dataset']}", owner=registry.owner(handle))
+        view["sample"] = {
+            "rows": len(sample),
+            "population": population,
+            "mode": "stratified" if strata else "reservoir",
+            "strata": strata,
+        }
+        return view
+
+    return registry.derived(handle, ("sample", mode, strata), build)
+
+
+def describe(view):
+    info = view.get("sample") if isinstance(view, dict) else None
+    if not info:
+        return None
+    text = f"Sample: {info['rows']:,} of {info['population']:,} rows"
+    if info["strata"]:
+        text += f", stratified by {info['strata']}"
+    return text + " | 95% confidence intervals shown"
+
+
+# -------------------------------------------------------------------
+# Confidence intervals
+# -------------------------------------------------------------------
+def _fpc(info):
+    # finite population correction: a sample of most of the rows is nearly exact
+    return math.sqrt(max(0.0, 1 - info["rows"] / info["population"]))
+
+
+def _column(ds, col):
+    if isinstance(ds, ChunkedDataset):
+        return pd.concat([chunk[col] for chunk in ds.iter_chunks([col])], ignore_index=True)
+    return ds[col]
+
+
+def _fmt(lo, hi):
+    return f"[{lo:.4g}, {hi:.4g}]"
+
+
+def numeric_intervals(values, info):
+    """95% intervals for the mean and the quartiles of a numeric sample."""
+    values = np.sort(values.dropna().to_numpy(dtype="float64"))
+    n = len(values)
+    if n < 2:
+        return {}
+    half = CONFIDENCE_Z * values.std(ddof=1) / math.sqrt(n) * _fpc(info)
+    mean = values.mean()
+    intervals = {"mean": (mean - half, mean + half)}
+    for label, p in (("25%", 0.25), ("50%", 0.5), ("75%", 0.75)):
+        # order statistics around rank n*p (normal approximation to the binomial)
+        spread = CONFIDENCE_Z * math.sqrt(n * p * (1 - p)) * _fpc(info)
+        lo = max(int(math.floor(n * p - spread)), 0)
+        hi = min(int(math.ceil(n * p + spread)), n - 1)
+        intervals[label] = (values[lo], values[hi])
+    return intervals
+
+
+def with_intervals(desc, ds, col, info, numeric):
+    """Add confidence intervals (and population estimates) to a profile table."""
+    desc = desc.copy()
+    if numeric:
+        stats = desc.iloc[:, 0]
+        intervals = numeric_intervals(_column(ds, col), info)
+        desc["95% CI"] = [_fmt(*intervals[stat]) if stat in intervals else "" for stat in stats]
+        # the count is of sampled rows: label it and scale it up like the categories
+        counts = desc.iloc[:, 1].where(stats == "count")
+        desc["Est. rows"] = [
+            "" if pd.isna(c) else int(round(c * expansion(info))) for c in counts
+        ]
+        desc.iloc[:, 0] = stats.replace({"count": "count (sample)"})
+        return desc
+
+    n = info["rows"]
+    share = desc["Count"] / n
+    desc["Share"] = share.round(4)
+    if col == info["strata"]:
+        # proportional allocation fixes these shares: there is nothing to estimate
+        desc["95% CI"] = "exact (stratified)"
+    else:
+        half = CONFIDENCE_Z * np.sqrt(share * (1 - share) / n) * _fpc(info)
+        desc["95% CI"] = [_fmt(max(p - h, 0), min(p + h, 1)) for p, h in zip(share, half)]
+    desc["Est. rows"] = (share * info["population"]).round().astype("int64")
+    return desc
+
+
+def correlation_interval(r, info):
+    """Fisher z interval for a Pearson correlation measured on the sample."""
+    n = info["rows"]
+    if n <= 3 or not np.isfinite(r) or abs(r) >= 1:
+        return None
+    z = math.atanh(r)
+    half = CONFIDENCE_Z / math.sqrt(n - 3) * _fpc(info)
+    return math.tanh(z - half), math.tanh(z + half)
+
+
+def expansion(info):
+    """Factor from sample totals (counts, sums) to population estimates."""
+    return info["population"] / info["rows"] if info else 1.0
@@ -0,0 +1,31 @@
+# sessions.py
+# Browser session ids for server-side bookkeeping.
+#
+# Each browser gets a random id in an HttpOnly cookie on its first request (the
+# page load, before any callback fires).  Callbacks read it with
+# ``current_session()``; outside a request it is None.
+import uuid
+
+from flask import g, has_request_context, request
+
+SESSION_COOKIE = "dash_session"
+
+
+def init_app(server):
+    @server.before_request
+    def load_session_id():
+        sid = request.cookies.get(SESSION_COOKIE)
+        g.new_session = sid is None
+        g.session_id = sid or uuid.uuid4().hex
+
+    @server.after_request
+    def store_session_id(response):
+        if g.get("new_session"):
+            response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+        return response
+
+
+def current_session():
+    if not has_request_context():
+        return None
+    return g.get("session_id")
@@ -0,0 +1,79 @@
+# uploads.py
+# Turning uploaded CSV files into registered datasets.
+#
+# ``dcc.Upload`` sends the whole file to the server as one base64 string, so
+# the server holds it in memory (twice) before anything is parsed; that path is
+# for files that fit in memory.  Large files are posted as a raw request body to
+#
+#   POST /upload?name=<filename>
+#
+# which streams the body to a temporary file block by block and ingests it from
+# there, chunked on disk if it is too big for the session's memory budget even
+# after its older versions are spilled.  The Home page posts to it from the
+# browser (see the "large file" upload).
+import os
+import tempfile
+
+from flask import Blueprint, jsonify, request
+
+import ingest
+from datasets import registry
+from outofcore import OOC_THRESHOLD_BYTES, PROCESS_ROOT, ChunkedDataset
+from sessions import current_session
+
+UPLOAD_ROOT = os.path.join(PROCESS_ROOT, "uploads")
+UPLOAD_BLOCK_BYTES = 1024 ** 2
+
+uploads = Blueprint("uploads", __name__)
+
+
+def ingest_upload(source, filename):
+    """Read an upload (bytes or a path) and register it for the current session.
+
+    Returns ``(handle, message)``; raises ``ValueError`` if it is not a CSV.
+    """
+    owner = current_session()
+    reserved = 0
+    try:
+        # big files go straight to disk (gzip / zstd judged by their decompressed
+        # size); so do files whose DataFrame does not fit the session's budget
+        # even after its least recently used versions are spilled
+        csv_bytes = ingest.csv_size(source, OOC_THRESHOLD_BYTES)
+        chunked = csv_bytes > OOC_THRESHOLD_BYTES
+        if not chunked:
+            # reserved before reading, so concurrent uploads cannot share the headroom
+            estimate = ingest.frame_bytes_estimate(source, csv_bytes)
+            chunked = not registry.reserve(owner, estimate)
+            reserved = 0 if chunked else estimate
+        data, stats = ingest.read_csv(source, chunked=chunked)
+    except Exception as exc:
+        registry.release(owner, reserved)
+        raise ValueError("could not read the uploaded file as CSV") from exc
+
+    msg = f"Uploaded file: {filename} | Shape: {data.shape[0]} rows, {data.shape[1]} columns"
+    msg += f" | Parsed {ingest.describe(stats)}"
+    if isinstance(data, ChunkedDataset):
+        msg += " | Out-of-core mode (chunked on disk)"
+    handle = registry.add(data, name=filename, owner=owner, reserved=reserved)
+    msg += f" | Dataset id: {handle['dataset']}"
+    return handle, msg
+
+
+@uploads.route("/upload", methods=["POST"])
+def streamed_upload():
+    filename = request.args.get("name") or "upload.csv"
+    os.makedirs(UPLOAD_ROOT, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=UPLOAD_ROOT)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = request.stream.read(UPLOAD_BLOCK_BYTES)
+                if not block:
+                    break
+                out.write(block)
+        handle, msg = ingest_upload(path, filename)
+    except ValueError as exc:
+        return jsonify(error=f"Error: {exc}."), 400
+    finally:
+        os.remove(path)
+    return jsonify(handle=handle, message=msg)